@@ -1,6 +1,42 @@
 
-from .pkclick import *
-from .pkcsv import *
-from .pkmath import *
-from .pksnp import *
+# The subpackages are imported on first use (PEP 562), so 'import pklib' is cheap and a tool only pays for what it uses.
+# pklib.X works for every name the subpackages export, as when this file did 'from .pkclick import *' and so on.
 
+_SUBPACKAGES = ("pkclick", "pkcsv", "pkmath", "pksnp") # On a name clash, the last one wins
+
+_EXPORTS = {
+    "pkclick" : ("gzFile", "isalFile", "CSV", "CSVFile", "SampleList", "Timedelta", "unicodeerror_handler",
+                 "BED3", "CSViter", "CSVlist", "VCFFile", "PGSFile", "register_codec"),
+    "pkcsv"   : ("reader", "DictReader", "Row", "sniff", "infer_schema", "NA_VALUES", "ParallelReader"),
+    "pkmath"  : ("rank_int", "rank_int_frame", "scaler_absolute_maximum", "scaler_min_max", "scaler_z_scores",
+                 "AbsoluteMaximumScaler", "MinMaxScaler", "ZScoreScaler", "iter_chunks", "parallel_columns"),
+    "pksnp"   : ("Locus", "Interval", "IntervalList", "IntervalIndex", "LocusArray", "IntervalArray", "LocusIndex", "sweep_join", "polygenic_score"),
+}
+_WHERE = {name: package for (package, names) in _EXPORTS.items() for name in names}
+_namespace = globals() # Looked up names are cached here. NB: They can shadow builtins, eg. click.globals
+
+def __getattr__(name):
+    import importlib
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f".{name}", __name__)
+    if name == "__all__":
+        return sorted(set(_public()))
+    if name.startswith("_"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Names re-exported from click and csv (and anything else) are looked for in all subpackages, last one first
+    for package in ([_WHERE[name]] if name in _WHERE else reversed(_SUBPACKAGES)):
+        module = importlib.import_module(f".{package}", __name__)
+        if hasattr(module, name):
+            value = _namespace[name] = getattr(module, name)
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(_namespace) | set(_SUBPACKAGES) | set(_public()))
+
+def _public():
+    """All names exported by the subpackages. Imports all of them."""
+    import importlib
+    for package in _SUBPACKAGES:
+        yield package
+        yield from (name for name in dir(importlib.import_module(f".{package}", __name__)) if not name.startswith("_"))
@@ -0,0 +1,9 @@
+
+# Benchmarks for the hot paths in pklib, on synthetic data made by generators.py. Run with:
+#   python -m pklib.benchmarks                          # All benchmarks
+#   python -m pklib.benchmarks -k gzFile --save base.json
+#   python -m pklib.benchmarks --compare base.json      # Exits with 1 if anything got slower or bigger than the tolerance
+#   python -m pklib.benchmarks --check-imports          # Exits with 1 if 'import pklib' and friends import more than they should
+# Baselines depend on the machine, so none are shipped; save one before a change and compare after it.
+
+from .suite import BENCHMARKS, benchmark, check_imports, compare, measure, run
@@ -0,0 +1,53 @@
+
+#
+# --%%  __main__.py    %%--
+#
+
+import click
+import logging
+import sys
+
+from . import suite
+
+
+@click.command()
+@click.option("-k", "--keyword", multiple=True, help="Only run benchmarks with this in their name. Can be repeated.")
+@click.option("--scale", type=float, default=1.0, show_default=True, help="Multiply the size of all inputs.")
+@click.option("--repeat", type=int, default=3, show_default=True, help="Time each benchmark this many times and keep the best.")
+@click.option("--seed", type=int, default=1, show_default=True, help="Seed for the data generators.")
+@click.option("--workdir", type=click.Path(file_okay=False, exists=True), help="Where to write the generated files (default: system temp).")
+@click.option("--save", type=click.Path(dir_okay=False), help="Save the results as JSON, eg. as a baseline.")
+@click.option("--compare", "baseline", type=click.Path(dir_okay=False, exists=True), help="Compare with a saved baseline.")
+@click.option("--tolerance", type=float, default=0.25, show_default=True, help="Allowed slowdown (and memory growth) as a fraction.")
+@click.option("--check-imports", is_flag=True, help="Only check that importing pklib stays lazy; exits with 1 if not.")
+@click.option("--list", "list_only", is_flag=True, help="List the benchmarks and exit.")
+@click.option("-v", "--verbose", is_flag=True, help="Log progress.")
+def main(keyword, scale, repeat, seed, workdir, save, baseline, tolerance, check_imports, list_only, verbose):
+    """Benchmark pklib on synthetic genomic data."""
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format="%(levelname)s %(message)s")
+    names = [name for name in suite.BENCHMARKS if not keyword or any(k in name for k in keyword)]
+    if list_only:
+        click.echo("\n".join(names))
+        return
+    if check_imports:
+        failures = suite.check_imports()
+        for (module, found) in failures.items():
+            click.echo(f"import {module} also imports: {', '.join(found)}")
+        click.echo("Imports are lazy." if not failures else "")
+        sys.exit(1 if failures else 0)
+    results = suite.run(names, workdir=workdir, scale=scale, repeat=repeat, seed=seed)
+    for (name, result) in results["results"].items():
+        click.echo(f"{name:24} {suite.format_result(result)}")
+    if save:
+        suite.save(results, save)
+    if baseline:
+        regressions = 0
+        click.echo(f"\nCompared with {baseline} (tolerance {tolerance:.0%}):")
+        for (name, time_ratio, memory_ratio, regressed) in suite.compare(results, suite.load(baseline), tolerance):
+            regressions += regressed
+            click.echo(f"{name:24} time x{time_ratio:.2f}  memory x{memory_ratio:.2f}{'  REGRESSION' if regressed else ''}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+
+#
+# --%%  generators.py    %%--
+#
+
+__version__ = "1.0"
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Deterministic synthetic inputs for the benchmarks. The same seed and size always give the same bytes.
+
+CONTIGS = { # GRCh38 lengths
+    "1": 248956422, "2": 242193529, "3": 198295559, "4": 190214555, "5": 181538259, "6": 170805979, "7": 159345973,
+    "8": 145138636, "9": 138394717, "10": 133797422, "11": 135086622, "12": 133275309, "13": 114364328, "14": 107043718,
+    "15": 101991189, "16": 90338345, "17": 83257441, "18": 80373285, "19": 58617616, "20": 64444167, "21": 46709983,
+    "22": 50818468, "X": 156040895,
+}
+
+
+#
+# -%  Genomic positions  %-
+
+def positions(n, seed=1):
+    """Return (chroms, pos) for n sorted positions spread over the genome in proportion to contig length."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    names = list(CONTIGS)
+    lengths = np.array([CONTIGS[name] for name in names], dtype=np.int64)
+    counts = rng.multinomial(n, lengths / lengths.sum())
+    chroms = np.repeat(np.arange(len(names)), counts)
+    pos = np.concatenate([np.sort(rng.integers(1, length, size=count)) for (length, count) in zip(lengths, counts)])
+    return (np.array(names, dtype=object)[chroms], pos)
+
+def alleles(n, seed=2):
+    """Return (ref, alt) for n biallelic SNPs."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    bases = np.array(list("ACGT"), dtype=object)
+    ref = rng.integers(0, 4, size=n)
+    alt = (ref + rng.integers(1, 4, size=n)) % 4
+    return (bases[ref], bases[alt])
+
+
+
+#
+# -%  Text files  %-
+
+def bed_lines(n, seed=1, prefix="chr"):
+    """Yield the lines of a sorted BED6 file with n intervals of 1 bp to 100 kb."""
+    import numpy as np
+    (chroms, start) = positions(n, seed)
+    rng = np.random.default_rng(seed + 100)
+    end = start + rng.geometric(1 / 2000, size=n).clip(1, 100_000)
+    strand = np.where(rng.random(n) < 0.5, "+", "-")
+    for i in range(n):
+        yield f"{prefix}{chroms[i]}\t{start[i]}\t{end[i]}\tregion{i}\t{i % 1000}\t{strand[i]}\n"
+
+def sumstats_lines(n, seed=3, comments=20):
+    """Yield the lines of a GWAS summary statistics TSV with n SNPs, sorted by position, after a block of comment lines."""
+    import numpy as np
+    (chroms, pos) = positions(n, seed)
+    (ref, alt) = alleles(n, seed + 1)
+    rng = np.random.default_rng(seed + 2)
+    beta = rng.normal(0, 0.02, size=n)
+    se = rng.uniform(0.005, 0.03, size=n)
+    p = np.clip(rng.uniform(size=n) ** 2, 1e-300, 1)
+    freq = rng.uniform(0.01, 0.99, size=n)
+    for i in range(comments):
+        yield f"## comment line {i}: generated by pklib.benchmarks (seed={seed})\n"
+    yield "CHR\tPOS\tSNP\tA1\tA2\tFRQ\tBETA\tSE\tP\tN\n"
+    for i in range(n):
+        yield f"{chroms[i]}\t{pos[i]}\trs{1000000 + i}\t{alt[i]}\t{ref[i]}\t{freq[i]:.4f}\t{beta[i]:.6f}\t{se[i]:.6f}\t{p[i]:.4g}\t{50000 + i % 1000}\n"
+
+def sample_lines(n, seed=4):
+    """Yield a list of n sample IDs, one per line."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    for i in rng.permutation(n):
+        yield f"SAMPLE{i:08d}\n"
+
+def write(path, lines):
+    """Write lines to path. Returns path."""
+    with open(path, "w") as f:
+        f.writelines(lines)
+    return path
+
+def compress(path, kind="gz"):
+    """Write a gzip ('gz') or BGZF ('bgz') copy of path next to it. Returns the new path."""
+    import gzip
+    import shutil
+    out = f"{path}.{kind}"
+    with open(path, "rb") as src:
+        if kind == "bgz":
+            from ..pkclick.bgzf import bgzip
+            with open(out, "wb") as dst:
+                bgzip(src, dst)
+        else:
+            with gzip.GzipFile(out, "wb", compresslevel=6, mtime=0) as dst:
+                shutil.copyfileobj(src, dst)
+    return out
+
+
+
+#
+# -%  In-memory data  %-
+
+def phenotypes(n_samples, n_traits, seed=5, missing=0.05):
+    """Return a DataFrame of n_samples x n_traits skewed phenotypes with a fraction of missing values and some ties."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(0, 1, size=(n_samples, n_traits)).round(2) # Rounding gives ties
+    values[rng.random(values.shape) < missing] = np.nan
+    return pd.DataFrame(values, index=[f"SAMPLE{i:08d}" for i in range(n_samples)], columns=[f"trait{j}" for j in range(n_traits)])
+
+def locus_ids(n, seed=6):
+    """Return n position IDs like '7:117559590'."""
+    (chroms, pos) = positions(n, seed)
+    return [f"{chrom}:{p}" for (chrom, p) in zip(chroms, pos)]
+
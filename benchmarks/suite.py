@@ -0,0 +1,327 @@
+
+#
+# --%%  suite.py    %%--
+#
+
+__version__ = "1.0"
+
+import logging
+import os
+import time
+
+from . import generators
+
+logger = logging.getLogger(__name__)
+
+# A benchmark is a function taking a Data object, which does its setup and returns a function running the workload once.
+# That function returns (items, bytes) processed, which give the throughput. Register new ones with @benchmark.
+
+BENCHMARKS = {}
+
+def benchmark(name, unit="rows"):
+    """Decorator registering a benchmark under name. unit: What the items are (rows, lines, values, ...)."""
+    def register(func):
+        BENCHMARKS[name] = (func, unit)
+        return func
+    return register
+
+
+
+#
+# -%  CLASS: Data  %-
+
+class Data(object):
+    """The synthetic inputs, generated on first use in workdir. scale multiplies all sizes."""
+    def __init__(self, workdir, scale=1.0, seed=1):
+        self.workdir = workdir
+        self.scale = scale
+        self.seed = seed
+        self._cache = {}
+
+    def size(self, n):
+        return max(int(n * self.scale), 10)
+
+    def path(self, name, lines):
+        """Write the file name (once) and return its path."""
+        if name not in self._cache:
+            self._cache[name] = generators.write(os.path.join(self.workdir, name), lines())
+        return self._cache[name]
+
+    def compressed(self, path, kind):
+        key = f"{path}.{kind}"
+        if key not in self._cache:
+            self._cache[key] = generators.compress(path, kind)
+        return self._cache[key]
+
+    @property
+    def bed(self):
+        return self.path("regions.bed", lambda: generators.bed_lines(self.size(500_000), seed=self.seed))
+
+    @property
+    def sumstats(self):
+        return self.path("sumstats.tsv", lambda: generators.sumstats_lines(self.size(300_000), seed=self.seed + 2))
+
+    @property
+    def samples(self):
+        return self.path("samples.txt", lambda: generators.sample_lines(self.size(100_000), seed=self.seed + 3))
+
+    @property
+    def phenotypes(self):
+        if "phenotypes" not in self._cache:
+            self._cache["phenotypes"] = generators.phenotypes(self.size(100_000), 10, seed=self.seed + 4)
+        return self._cache["phenotypes"]
+
+    @property
+    def locus_ids(self):
+        if "locus_ids" not in self._cache:
+            self._cache["locus_ids"] = generators.locus_ids(self.size(200_000), seed=self.seed + 5)
+        return self._cache["locus_ids"]
+
+
+
+#
+# -%  Benchmarks  %-
+
+@benchmark("pkcsv.configure", unit="files")
+def pkcsv_configure(data):
+    """Sniffing the dialect and header: Opening a reader on a file with a comment block, 200 times."""
+    from ..pkcsv import reader
+    path = data.sumstats
+    def run():
+        for _ in range(200):
+            with open(path, newline="") as f:
+                reader(f, comment_char="#")
+        return (200, None)
+    return run
+
+@benchmark("pkcsv.reader")
+def pkcsv_reader(data):
+    from ..pkcsv import reader
+    path = data.sumstats
+    def run():
+        with open(path, newline="") as f:
+            return (sum(1 for _ in reader(f, comment_char="#")), os.path.getsize(path))
+    return run
+
+@benchmark("pkcsv.read_batches")
+def pkcsv_read_batches(data):
+    from ..pkcsv import reader
+    path = data.sumstats
+    def run():
+        with open(path, newline="") as f:
+            blocks = reader(f, comment_char="#").read_batches(50_000, header=True, dtypes="infer")
+            return (sum(len(block["POS"]) for block in blocks), os.path.getsize(path))
+    return run
+
+def _gzfile(data, cls, kind, threads):
+    path = data.compressed(data.sumstats, kind)
+    size = os.path.getsize(data.sumstats)
+    def run():
+        f = cls(mode="rb", threads=threads).convert(path, None, None)
+        try:
+            n = sum(1 for _ in f)
+        finally:
+            f.close()
+        return (n, size)
+    return run
+
+@benchmark("gzFile.gzip", unit="lines")
+def gzfile_gzip(data):
+    from ..pkclick.pkclick import gzFile
+    return _gzfile(data, gzFile, "gz", 0)
+
+@benchmark("gzFile.gzip.threads", unit="lines")
+def gzfile_gzip_threads(data):
+    from ..pkclick.pkclick import gzFile
+    return _gzfile(data, gzFile, "gz", 2)
+
+@benchmark("gzFile.bgzf", unit="lines")
+def gzfile_bgzf(data):
+    from ..pkclick.pkclick import gzFile
+    return _gzfile(data, gzFile, "bgz", 0)
+
+@benchmark("gzFile.bgzf.threads", unit="lines")
+def gzfile_bgzf_threads(data):
+    from ..pkclick.pkclick import gzFile
+    return _gzfile(data, gzFile, "bgz", 4)
+
+@benchmark("SampleList", unit="samples")
+def sample_list(data):
+    from ..pkclick.pkclick import SampleList
+    path = data.samples
+    def run():
+        return (len(SampleList(mode="rb").convert(path, None, None)), os.path.getsize(path))
+    return run
+
+@benchmark("rank_int", unit="values")
+def rank_int(data):
+    from ..pkmath import rank_int
+    series = data.phenotypes.iloc[:, 0]
+    def run():
+        rank_int(series)
+        return (len(series), None)
+    return run
+
+@benchmark("rank_int_frame", unit="values")
+def rank_int_frame(data):
+    from ..pkmath import rank_int_frame
+    frame = data.phenotypes
+    def run():
+        rank_int_frame(frame)
+        return (frame.size, None)
+    return run
+
+@benchmark("Locus", unit="loci")
+def locus(data):
+    from ..pksnp import Locus
+    ids = data.locus_ids
+    def run():
+        for ID in ids:
+            Locus(ID=ID)
+        return (len(ids), None)
+    return run
+
+@benchmark("LocusArray.fromIDs", unit="loci")
+def locus_array(data):
+    from ..pksnp import LocusArray
+    ids = data.locus_ids
+    def run():
+        LocusArray.fromIDs(ids)
+        return (len(ids), None)
+    return run
+
+@benchmark("IntervalList.merge", unit="intervals")
+def interval_list(data):
+    from ..pkcsv import reader
+    from ..pksnp import IntervalList
+    with open(data.bed, newline="") as f:
+        rows = [row[:3] for row in reader(f, delimiter="\t")]
+    def run():
+        intervals = IntervalList(rows)
+        intervals.merge()
+        return (len(rows), None)
+    return run
+
+
+def _fresh_process(statement):
+    """Run statement in a new interpreter which finds this copy of pklib. Returns its output."""
+    import subprocess
+    import sys
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [_ROOT, os.environ.get("PYTHONPATH")])))
+    return subprocess.run([sys.executable, "-c", statement], env=env, check=True, capture_output=True, text=True).stdout
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The directory holding pklib
+
+def _startup(module):
+    def run():
+        for _ in range(10):
+            _fresh_process(f"import {module}")
+        return (10, None)
+    return run
+
+@benchmark("startup.pklib", unit="starts")
+def startup_pklib(data):
+    """Starting Python and importing pklib, as every CLI tool does. Guards the lazy imports in __init__.py."""
+    return _startup("pklib")
+
+@benchmark("startup.pkclick", unit="starts")
+def startup_pkclick(data):
+    return _startup("pklib.pkclick")
+
+# Modules each import must not pull in. Checked by check_imports (and --check-imports)
+LAZY_IMPORTS = {
+    "pklib"         : ("click", "numpy", "pandas", "scipy", "pklib.pkclick", "pklib.pkcsv", "pklib.pkmath", "pklib.pksnp"),
+    "pklib.pkclick" : ("click", "numpy", "pandas", "scipy", "pklib.pkclick.pkclick"),
+    "pklib.pkcsv"   : ("click", "numpy", "pandas", "scipy"),
+    "pklib.pkmath"  : ("click", "numpy", "pandas", "scipy"),
+    "pklib.pksnp"   : ("click", "numpy", "pandas", "scipy"),
+}
+
+def check_imports(checks=LAZY_IMPORTS):
+    """Import each module in a fresh process. Returns {module: [modules it should not have imported]} for the failures."""
+    failures = {}
+    for (module, forbidden) in checks.items():
+        loaded = set(_fresh_process(f"import sys, {module}; print(*sys.modules)").split())
+        if (found := sorted(loaded.intersection(forbidden))):
+            failures[module] = found
+    return failures
+
+
+
+#
+# -%  Running and comparing  %-
+
+def measure(run, repeat=3):
+    """Time run (best of repeat), then run it once more under tracemalloc for the peak memory of Python allocations.
+    One untimed run goes first, so lazy imports and caches are not counted."""
+    import tracemalloc
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        (items, nbytes) = run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    seconds = min(times)
+    return {"seconds": seconds, "items": items, "bytes": nbytes, "items_per_sec": items / seconds,
+            "mb_per_sec": nbytes / seconds / 1e6 if nbytes else None, "peak_mb": peak / 1e6}
+
+def run(names=None, workdir=None, scale=1.0, repeat=3, seed=1):
+    """Run the benchmarks in names (default: all) and return {"meta": ..., "results": {name: result}}."""
+    import platform
+    import sys
+    import tempfile
+    names = list(BENCHMARKS) if names is None else names
+    with tempfile.TemporaryDirectory(prefix="pklib-bench-", dir=workdir) as tmp:
+        data = Data(tmp, scale=scale, seed=seed)
+        results = {}
+        for name in names:
+            (func, unit) = BENCHMARKS[name]
+            try:
+                workload = func(data)
+            except ImportError as e:
+                logger.warning(f"Skipping {name}: {e}")
+                continue
+            results[name] = dict(measure(workload, repeat=repeat), unit=unit)
+            logger.info(f"{name}: {format_result(results[name])}")
+    meta = {"python": sys.version.split()[0], "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "scale": scale, "seed": seed, "repeat": repeat}
+    return {"meta": meta, "results": results}
+
+def compare(current, baseline, tolerance=0.25):
+    """Compare two runs. Returns a list of (name, time ratio, memory ratio, regressed), where a ratio above 1 + tolerance
+    (slower, or more memory) is a regression. Memory growth under 1 MB is ignored. Benchmarks missing from either run are left out."""
+    out = []
+    if current["meta"].get("scale") != baseline["meta"].get("scale"):
+        logger.warning(f"Comparing runs with different scales: {current['meta'].get('scale')} vs {baseline['meta'].get('scale')}.")
+    for (name, result) in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        base = baseline["results"][name]
+        time_ratio = result["seconds"] / base["seconds"]
+        memory_ratio = result["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+        more_memory = memory_ratio > 1 + tolerance and result["peak_mb"] - base["peak_mb"] > 1
+        out.append((name, time_ratio, memory_ratio, time_ratio > 1 + tolerance or more_memory))
+    return out
+
+def format_result(result):
+    text = f"{result['seconds']:.3f} s, {result['items_per_sec']:,.0f} {result['unit']}/s"
+    if result["mb_per_sec"]:
+        text += f", {result['mb_per_sec']:.1f} MB/s"
+    return text + f", peak {result['peak_mb']:.1f} MB"
+
+def save(results, path):
+    import json
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+
+def load(path):
+    import json
+    with open(path) as f:
+        return json.load(f)
+
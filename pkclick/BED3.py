@@ -7,6 +7,7 @@ import click
 import logging
 
 from .BED3iter import BED3iter
+from .metrics import MeteredRows, text, track
 
 logger = logging.getLogger(__name__)
 
@@ -23,18 +24,50 @@ logger = logging.getLogger(__name__)
 
 class BED3(click.File):
     """A class for opening files with data columns and returning them as a list without headline.
-       Output: An iterator which returns each line in a bed file as a list of the column values."""
+       Output: An iterator which returns each line in a bed file as a list of the column values.
+       With a region (eg. 'chr7:100000-200000' or just 'chr7'), only the lines overlapping it are returned, with start
+       and stop as int. The region is given to the constructor or read from the parameter region_param of the command;
+       that parameter must be processed before this one (eg. declare it first, or with is_eager=True).
+       Bgzipped files with an index (tabix .tbi/.csi or pkclick.region's .pki) are read only where the region is; other
+       files are scanned from the top and not read past the region, which assumes they are sorted (is_sorted=False reads
+       them to the end). The file is left open either way."""
     name = "BED_FILE"
 
+    def __init__(self, *args, region=None, region_param="region", integers=False, is_sorted=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.region = region
+        self.region_param = region_param
+        self.integers = integers
+        self.is_sorted = is_sorted
+
     def convert(self, value, param, ctx):
         """Convert by calling csv.reader on filehandle."""
         import pklib.pkcsv as csv
         if not isinstance(value, type(str())):
             return value
+        region = self.region or (ctx.params.get(self.region_param) if ctx is not None else None)
         try:
+            metrics = track(value, "BED3")
+            if region is not None and (rows := self._fetch(value, region)) is not None:
+                logger.debug(f" Reading region '{region}' from '{value}' using its index")
+                return self._metered(BED3iter(rows, region=region, is_sorted=self.is_sorted), metrics)
             f = super().convert(value, param, ctx)
             logger.debug(f" Reading data table from '{f.name}'")
-            return BED3iter(csv.reader(f, comment_char="#"))
+            if metrics is not None:
+                f = text(f, metrics)
+            return self._metered(BED3iter(csv.reader(f, comment_char="#"), region=region, integers=self.integers, is_sorted=self.is_sorted), metrics)
         except Exception as e:
             logger.error(f" {e}")
             self.fail(f"ERROR: Unable to open '{value}' as a BED file.")
+
+    @staticmethod
+    def _metered(rows, metrics):
+        return rows if metrics is None else MeteredRows(rows, metrics)
+
+    @staticmethod
+    def _fetch(path, region):
+        """Rows overlapping region from an indexed file, or None if path has no index."""
+        from .region import fetch, find_index
+        if path == "-" or find_index(path) is None:
+            return None
+        return (line.rstrip("\r\n").split("\t") for line in fetch(path, region) if line.strip() and not line.startswith(("#", "track", "browser")))
@@ -19,27 +19,63 @@ logger = logging.getLogger(__name__)
 # -%  CLASS: BED3iter  %-
 
 class BED3iter(object):
-    """Class to iterate over BED data. Will return BED3 only which is the first three columns of a BED file. Will set col3 to col2 if missing."""
-    def __init__(self, iterator):
+    """Class to iterate over BED data. Will return BED3 only which is the first three columns of a BED file. Will set col3 to col2 if missing.
+    With region, only rows overlapping the region are returned; on sorted input, iteration stops after the region."""
+    def __init__(self, iterator, region=None, integers=False, is_sorted=True):
         """
         iterator: Iterator which returns rows of BED data as lists (or tuples).
+        region: Only return rows overlapping this region; a string like 'chr7:100000-200000' or 'chr7', or (chrom, start, end)
+                with 0-based half-open coordinates (start and end can be None).
+        integers: Return start and stop as int instead of str (always the case with a region).
+        is_sorted: Whether the input is sorted by contig and start, so the scan can stop at the end of the region.
         """
+        from .region import parse_region
         self.iter = iterator
+        self.region = parse_region(region) if isinstance(region, str) else region
+        self.integers = integers or region is not None
+        self.is_sorted = is_sorted
+        self._seen = False
+        self._rows = 0
 
     def __iter__(self):
         return self
     
     def __next__(self):
-        row = next(self.iter)
-        try:
-            (chrom, start, stop, *_) = row
-        except ValueError:
+        while True:
+            row = next(self.iter)
+            self._rows += 1
             try:
-                (chrom, start) = row
-                stop = start
-            except Exception as e:
-                logger.error(f" Encountered {e}")
-        return (chrom, start, stop)
+                (chrom, start, stop, *_) = row
+            except ValueError:
+                try:
+                    (chrom, start) = row
+                    stop = start
+                except Exception as e:
+                    logger.error(f" Encountered {e}")
+            if self.integers:
+                try:
+                    (start, stop) = (int(start), int(stop))
+                except ValueError:
+                    if self._rows == 1:
+                        logger.debug(f" Skipping header line: {row}")
+                        continue
+                    raise
+            if self.region is None or self._overlaps(chrom, start, stop):
+                return (chrom, start, stop)
+
+    def _overlaps(self, chrom, start, stop):
+        """Does the row overlap the region? Ends the iteration once a sorted input has passed the region."""
+        (rchrom, rstart, rend) = self.region
+        if chrom != rchrom:
+            if self._seen and self.is_sorted:
+                raise StopIteration
+            return False
+        self._seen = True
+        if rend is not None and start >= rend:
+            if self.is_sorted:
+                raise StopIteration
+            return False
+        return rstart is None or max(stop, start + 1) > rstart
 
     def __add__(self, other):
         from itertools import chain
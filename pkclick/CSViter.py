@@ -6,6 +6,8 @@
 import click
 import logging
 
+from .metrics import MeteredRows, text, track
+
 logger = logging.getLogger(__name__)
 
 # NOTE: Here's some fun. All click type extenders must obey these guys:
@@ -25,11 +27,13 @@ class CSViter(click.File):
     def convert(self, value, param, ctx):
         """Convert by calling csv.reader on filehandle."""
         import pklib.pkcsv as csv
-        if value is None or isinstance(value, csv.reader):
+        if value is None or isinstance(value, (csv.reader, MeteredRows)):
             return value
         try:
             f = super().convert(value, param, ctx)
             logging.debug(f"CSVIter: Reading data table from '{f.name}'")
+            if (metrics := track(f.name, "CSViter")) is not None:
+                return MeteredRows(csv.reader(text(f, metrics), comment_char="#"), metrics)
             return csv.reader(f, comment_char="#")
         except Exception as e:
             logging.debug(e)
@@ -6,6 +6,7 @@
 
 import click
 import logging
+import os
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -19,24 +20,29 @@ logger = logging.getLogger(__name__)
 #    it needs to call self.fail() if conversion fails
 
 class PGSFile(click.File):
-	"""A class for parsing a PGS file using pgscatalog."""
+	"""A class for parsing a PGS file using pgscatalog. Accessions are downloaded to a local cache, see pgscache.py.
+	cache_dir: The cache directory (default: $PKLIB_PGS_CACHE or ~/.cache/pklib/pgs). build: 'GRCh37' or 'GRCh38' for the harmonized file.
+	parsed: Return a PGSScore with the variants and weights as (memory-mapped) columns, instead of a pgscatalog ScoringFile."""
 	name = "PGSFILE"
 
+	def __init__(self, *args, cache_dir=None, build=None, parsed=False, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.cache_dir = cache_dir
+		self.build = build
+		self.parsed = parsed
+
 	def convert(self, value, param, ctx):
-		from pgscatalog.core import ScoringFile
-		if value is None or isinstance(value, ScoringFile):
+		from . import pgscache
+		if value is None or not isinstance(value, (str, os.PathLike)):
 			return value
-		pgs = ScoringFile(value)
-		if not Path(value).exists():
-			try:
-				pgs.download(".") # TODO: Where should we put score files?
-			except FileExistsError:
-				if not Path(value).exists():
-					pgs = ScoringFile(f"{value}.txt.gz")
-				logger.debug(f"convert: '{pgs.local_path}' exists - Download aborted")
-			except:
-				self.fail(f"ERROR: Unable to open '{value}' as a PGS risk score")
-		return pgs
+		try:
+			path = Path(value) if Path(value).exists() else pgscache.fetch(value, self.cache_dir, build=self.build)
+			if self.parsed:
+				return pgscache.load(path, self.cache_dir)
+			from pgscatalog.core import ScoringFile
+			return ScoringFile(str(path))
+		except Exception as e:
+			self.fail(f"ERROR: Unable to open '{value}' as a PGS risk score: {e}")
 
 
 
@@ -30,7 +30,7 @@ class VCFFile(click.File):
 				from pysam import BGZFile, VariantFile
 				if 'r' in self.mode:
 					logging.debug(f"VCFFile: Reading variant info from {value}")
-					return VariantFile(value)
+					return self._metered(VariantFile(value), value)
 				elif 'w' in self.mode and value.endswith(".gz"):
 					logging.debug(f"VCFFile: Writing variant info to BGZfile {value}")
 					return BGZFile(value, self.mode)
@@ -44,3 +44,22 @@ class VCFFile(click.File):
 				self.fail(f"ERROR: Unable to open '{value}' as a VCF file.")
 		return value
 
+	@staticmethod
+	def map_regions(vcf, func, **kwargs):
+		"""Call func(records) on balanced regions of the indexed file vcf (a path, or a VariantFile from convert) in a pool of
+		processes, each with its own handle. Results come back in genome order. See vcfregions.map_regions for the arguments."""
+		from .vcfregions import map_regions
+		return map_regions(vcf, func, **kwargs)
+
+	@staticmethod
+	def _metered(vcf, path):
+		"""Count the records read from vcf, if pkclick.metrics is enabled."""
+		import os
+		from .metrics import MeteredRows, track
+		metrics = track(path, "VCFFile")
+		if metrics is None:
+			return vcf
+		metrics.size = lambda: os.path.getsize(path)
+		metrics.uncompressed_bytes = 0 # Decompressed inside htslib
+		return MeteredRows(vcf, metrics)
+
@@ -1,13 +1,63 @@
 
-# Import functions from click that we want to make available upstairs
-from click import *
-
-# Then import the functions from pkclick that we want to replace those in click
-from .pkclick import *
-
-# Finally inport from loose files:
-from .BED3    import BED3
-from .CSViter import CSViter
-from .CSVlist import CSVlist
-from .VCFFile import VCFFile
-from .PGSFile import PGSFile
+# Names are imported on first use (PEP 562), so importing pkclick doesn't import click and every param type up front.
+# Lookup order is as when this file did 'from click import *', then 'from .pkclick import *', then the loose files:
+# Our own names first, then the rest of pkclick.py, then click.
+
+import sys as _sys
+import types as _types
+
+_EXPORTS = {
+    ".pkclick"    : ("gzFile", "isalFile", "CSV", "CSVFile", "SampleList", "Timedelta", "unicodeerror_handler"),
+    ".BED3"       : ("BED3",),
+    ".CSViter"    : ("CSViter",),
+    ".CSVlist"    : ("CSVlist",),
+    ".VCFFile"    : ("VCFFile",),
+    ".PGSFile"    : ("PGSFile",),
+    ".compression": ("register_codec",),
+}
+_WHERE = {name: module for (module, names) in _EXPORTS.items() for name in names}
+_namespace = globals() # Looked up names are cached here. NB: They can shadow builtins, eg. click.globals
+
+def __getattr__(name):
+    import importlib
+    if name == "__all__":
+        return sorted(set(_public()))
+    if name.startswith("_"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name in _WHERE:
+        value = getattr(importlib.import_module(_WHERE[name], __name__), name)
+    else:
+        try: # Submodules like pklib.pkclick.region
+            return importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+        for module in (importlib.import_module(".pkclick", __name__), importlib.import_module("click")):
+            if not name.startswith("_") and hasattr(module, name):
+                value = getattr(module, name)
+                break
+        else:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    _namespace[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(_namespace) | set(_public()))
+
+def _public():
+    """All exported names. Imports click and pkclick.py."""
+    import importlib
+    for module in (importlib.import_module("click"), importlib.import_module(".pkclick", __name__)):
+        yield from (name for name in dir(module) if not name.startswith("_"))
+    yield from _WHERE
+
+
+class _Module(_types.ModuleType):
+    """The loose files are named after the class they hold. Importing one (eg. CSVlist does 'from .CSViter import CSViter')
+    binds the module to its name here, so bind the class instead, as the eager 'from .X import X' used to."""
+    def __setattr__(self, name, value):
+        if name in _EXPORTS.get(f".{name}", ()) and isinstance(value, _types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+_sys.modules[__name__].__class__ = _Module
@@ -0,0 +1,171 @@
+###########################################################
+#
+# ---%%%  BGZF: Blocked gzip files as written by bgzip/htslib  %%%---
+#
+
+import io
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# A BGZF block is a gzip member with a 'BC' extra subfield holding the block size (BSIZE = total block size - 1).
+# Blocks are at most 64 kB and compressed independently, so they can be decompressed in parallel.
+BGZF_MAGIC  = b"\x1f\x8b\x08\x04"
+BGZF_HEADER = 18
+
+def is_bgzf(f):
+    """Is the seekable binary file f a BGZF file? The position in f is left unchanged."""
+    pos = f.tell()
+    head = f.read(BGZF_HEADER)
+    f.seek(pos)
+    return len(head) == BGZF_HEADER and head.startswith(BGZF_MAGIC) and head[12:16] == b"BC\x02\x00"
+
+def read_block(f):
+    """Read the next compressed block from f. Returns None at the end of the file."""
+    head = f.read(BGZF_HEADER)
+    if not head:
+        return None
+    if len(head) < BGZF_HEADER or not head.startswith(BGZF_MAGIC) or head[12:14] != b"BC":
+        raise OSError("BGZF: Invalid or truncated block header.")
+    bsize = int.from_bytes(head[16:18], "little")
+    block = head + f.read(bsize + 1 - BGZF_HEADER)
+    if len(block) != bsize + 1:
+        raise OSError("BGZF: Truncated block.")
+    return block
+
+def inflate(block, decompress=zlib.decompress):
+    """Decompress one BGZF block and check its CRC."""
+    xlen = int.from_bytes(block[10:12], "little")
+    data = decompress(block[12 + xlen:-8], -15)
+    if zlib.crc32(data) != int.from_bytes(block[-8:-4], "little") or len(data) != int.from_bytes(block[-4:], "little"):
+        raise OSError("BGZF: CRC check failed.")
+    return data
+
+def blocks(f):
+    """Yield (compressed offset, uncompressed size) of every block from the current position in f, reading only the headers."""
+    while True:
+        coffset = f.tell()
+        head = f.read(BGZF_HEADER)
+        if not head:
+            return
+        if len(head) < BGZF_HEADER or not head.startswith(BGZF_MAGIC) or head[12:14] != b"BC":
+            raise OSError("BGZF: Invalid or truncated block header.")
+        f.seek(coffset + int.from_bytes(head[16:18], "little") - 3)
+        yield (coffset, int.from_bytes(f.read(4), "little"))
+
+
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+def deflate(data, level=6):
+    """Compress data (at most 64 kB) into one BGZF block."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    body = compressor.compress(data) + compressor.flush()
+    size = BGZF_HEADER + len(body) + 8
+    head = BGZF_MAGIC + b"\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00" + (size - 1).to_bytes(2, "little")
+    return head + body + zlib.crc32(data).to_bytes(4, "little") + len(data).to_bytes(4, "little")
+
+def bgzip(src, dst, level=6):
+    """Compress the binary file object src into dst as BGZF, like 'bgzip'. Blocks hold 65280 bytes of input, as in htslib."""
+    while (data := src.read(0xff00)):
+        dst.write(deflate(data, level))
+    dst.write(BGZF_EOF)
+
+
+#
+# -%  GZI: Block index, mapping uncompressed to compressed offsets  %-
+#
+# Same format as 'bgzip --reindex' and samtools faidx: A little-endian uint64 with the number of entries, followed by
+# (compressed offset, uncompressed offset) pairs as uint64, one for each block after the first.
+
+def build_gzi(path, out=None):
+    """Build the block index of the BGZF file path and write it to out (default: path + '.gzi'). Returns the index."""
+    index = []
+    uoffset = 0
+    with open(path, "rb") as f:
+        for (coffset, size) in blocks(f):
+            index.append((coffset, uoffset))
+            uoffset += size
+    write_gzi(index, out or f"{path}.gzi")
+    logger.info(f"BGZF: Indexed {len(index)} blocks in '{path}'.")
+    return index
+
+def write_gzi(index, path):
+    import struct
+    entries = [entry for entry in index if entry != (0, 0)]
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(entries)))
+        f.write(b"".join(struct.pack("<QQ", *entry) for entry in entries))
+
+def read_gzi(path):
+    """Read a .gzi file. Returns a list of (compressed offset, uncompressed offset), starting with (0, 0)."""
+    import struct
+    with open(path, "rb") as f:
+        (n,) = struct.unpack("<Q", f.read(8))
+        data = f.read(16 * n)
+    return [(0, 0)] + list(struct.iter_unpack("<QQ", data))
+
+def open_at(f, index, offset, threads=1, decompress=zlib.decompress):
+    """Return a binary stream reading the BGZF file f from uncompressed offset, decompressing only the blocks from there on.
+    index: The block index from read_gzi or build_gzi."""
+    from bisect import bisect_right
+    (coffset, uoffset) = index[bisect_right(index, offset, key=lambda entry: entry[1]) - 1]
+    f.seek(coffset)
+    stream = io.BufferedReader(BGZFReader(f, threads=threads, decompress=decompress))
+    stream.read(offset - uoffset)
+    return stream
+
+
+
+#
+# -%  CLASS: BGZFReader  %-
+
+class BGZFReader(io.RawIOBase):
+    """Decompresses BGZF input with a pool of threads; blocks are decompressed in parallel and returned in order.
+       zlib (and isal_zlib) release the GIL while inflating, so this uses several cores.
+       Wrap in io.BufferedReader before handing it to io.TextIOWrapper."""
+    def __init__(self, f, threads=4, decompress=zlib.decompress):
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        super().__init__()
+        self._f = f
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pkclick-bgzf")
+        self._pending = deque()
+        self._depth = 4 * threads
+        self._decompress = decompress
+        self._buffer = memoryview(b"")
+        self._eof = False
+
+    @property
+    def name(self):
+        return getattr(self._f, "name", None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            self._fill()
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            for job in self._pending:
+                job.cancel()
+            self._pool.shutdown(wait=False)
+        super().close()
+
+    def _fill(self):
+        """Keep up to depth blocks in flight."""
+        while not self._eof and len(self._pending) < self._depth:
+            block = read_block(self._f)
+            if block is None:
+                self._eof = True
+            else:
+                self._pending.append(self._pool.submit(inflate, block, self._decompress))
@@ -0,0 +1,236 @@
+###########################################################
+#
+# ---%%%  Codec registry: Detect compressed input from its magic bytes and decompress it  %%%---
+#
+
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Usage: open_stream(f) sniffs the binary file object f and returns a binary stream with the decompressed data
+# (or f itself if it isn't compressed). New formats can be added with register_codec, eg:
+#   register_codec("lz4", b"\x04\x22\x4d\x18", lz4_file)
+# Each codec has a list of backends, tried in order; the first one which can be imported is used from then on.
+# A backend is called as backend(f, threads) and must raise ImportError if its module isn't installed.
+
+CODECS = {}
+MAGIC  = {} # Magic bytes -> codec name. Shared with gzFile.magic_dict
+
+
+#
+# -%  CLASS: Codec  %-
+
+class Codec(object):
+    """A compression format: Its name, magic bytes and the backends which can decompress it (fastest first)."""
+    def __init__(self, name, magic, backends):
+        self.name = name
+        self.magic = magic
+        self.backends = list(backends)
+        self._backend = None
+
+    @property
+    def backend(self):
+        """Name of the backend in use (the first one that could be imported), or None if none has been tried yet."""
+        return None if self._backend is None else getattr(self._backend, "__name__", repr(self._backend))
+
+    def open(self, f, threads=0, backend=None):
+        """Return a binary stream decompressing f. backend: Use this backend (by function name) instead of the fastest one."""
+        if backend is not None:
+            for opener in self.backends:
+                if opener.__name__ == backend:
+                    return opener(f, threads)
+            raise ValueError(f"{self.name}: Unknown backend '{backend}'.")
+        if self._backend is not None:
+            return self._backend(f, threads)
+        for opener in self.backends:
+            try:
+                stream = opener(f, threads)
+            except ImportError:
+                logger.debug(f"{self.name}: Backend '{opener.__name__}' not installed.")
+                continue
+            self._backend = opener
+            logger.debug(f"{self.name}: Using backend '{opener.__name__}'.")
+            return stream
+        raise ImportError(f"None of the backends for '{self.name}' are installed: {[opener.__name__ for opener in self.backends]}")
+
+
+
+#
+# -%  Registry functions  %-
+
+def register_codec(name, magic, *backends):
+    """Register (or replace) a codec. magic: The bytes every file of this type starts with.
+    backends: Functions backend(f, threads) returning a binary stream, fastest first. Returns the Codec."""
+    assert backends, "register_codec needs at least one backend"
+    for (key, value) in list(MAGIC.items()):
+        if value == name:
+            del MAGIC[key]
+    CODECS[name] = Codec(name, magic, backends)
+    MAGIC[magic] = name
+    return CODECS[name]
+
+def sniff(f):
+    """Return the Codec of the binary file object f, or None if f isn't compressed or can't be checked.
+    Needs f to be seekable or to have a peek method (like io.BufferedReader, eg. sys.stdin.buffer)."""
+    size = max(len(magic) for magic in MAGIC)
+    if f.seekable():
+        pos = f.tell()
+        sample = f.read(size)
+        f.seek(pos)
+    elif hasattr(f, "peek"):
+        sample = f.peek(size)[:size]
+    else:
+        return None
+    for (magic, name) in MAGIC.items():
+        if sample.startswith(magic):
+            return CODECS[name]
+    return None
+
+def open_stream(f, threads=0, backend=None):
+    """Return a binary stream decompressing f if its magic bytes match a codec, else f itself."""
+    codec = sniff(f)
+    if codec is None:
+        return f
+    logger.info(f"compression: File type determined = {codec.name}.")
+    return codec.open(f, threads=threads, backend=backend)
+
+
+
+#
+# -%  Backends  %-
+
+def _readahead(stream, threads):
+    """Decompress on a background thread if threads > 0."""
+    if threads:
+        from .readahead import ReadAheadReader
+        return io.BufferedReader(ReadAheadReader(stream))
+    return stream
+
+def _bgzf(f, threads, decompress):
+    """Parallel BGZF reader, if threads > 0 and f is a seekable BGZF file. Otherwise None."""
+    from .bgzf import BGZFReader, is_bgzf
+    if threads and f.seekable() and is_bgzf(f):
+        logger.debug(f"compression: Decompressing BGZF blocks on {threads} threads.")
+        return io.BufferedReader(BGZFReader(f, threads=threads, decompress=decompress))
+    return None
+
+def isal_gzip(f, threads=0):
+    from isal import igzip, isal_zlib
+    stream = _bgzf(f, threads, isal_zlib.decompress)
+    if stream is not None:
+        return stream
+    if threads:
+        try:
+            from isal import igzip_threaded # python-isal >= 1.2
+            return igzip_threaded.open(f, "rb", threads=threads)
+        except ImportError:
+            pass
+    if threads or not f.seekable():
+        return _readahead(igzip.IGzipFile(fileobj=f), threads)
+    return io.BufferedReader(_Restartable(f, lambda f: igzip.IGzipFile(fileobj=f)))
+
+class _Restartable(io.RawIOBase):
+    """Seekable wrapper for a decompressed stream which can't seek backwards itself (IGzipFile from python-isal 1.8 fails
+    with BadGzipFile when rewound, eg. by pkcsv peeking at the first lines). Seeking backwards starts over on a new stream."""
+    def __init__(self, f, opener):
+        super().__init__()
+        self._f = f
+        self._origin = f.tell()
+        self._opener = opener
+        self._stream = opener(f)
+        self._pos = 0
+
+    @property
+    def name(self):
+        return getattr(self._f, "name", None)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def readinto(self, b):
+        n = self._stream.readinto(b)
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._stream.seek(0, io.SEEK_END) # Reads forward to the end
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence ({whence})")
+        if offset < self._stream.tell():
+            self._stream.close()
+            self._f.seek(self._origin)
+            self._stream = self._opener(self._f)
+        self._pos = self._stream.seek(max(offset, 0))
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+def zlib_ng_gzip(f, threads=0):
+    from zlib_ng import gzip_ng, zlib_ng
+    stream = _bgzf(f, threads, zlib_ng.decompress)
+    if stream is not None:
+        return stream
+    if threads:
+        try:
+            from zlib_ng import gzip_ng_threaded
+            return gzip_ng_threaded.open(f, "rb", threads=threads)
+        except ImportError:
+            pass
+    return _readahead(gzip_ng.GzipNGFile(fileobj=f), threads)
+
+def zlib_gzip(f, threads=0):
+    import gzip
+    import zlib
+    stream = _bgzf(f, threads, zlib.decompress)
+    if stream is not None:
+        return stream
+    return _readahead(gzip.GzipFile(fileobj=f), threads)
+
+def bz2_file(f, threads=0):
+    import bz2
+    return _readahead(bz2.BZ2File(f), threads)
+
+def zip_file(f, threads=0):
+    """Read the first member of a zip archive."""
+    import zipfile
+    archive = zipfile.ZipFile(f)
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if not members:
+        raise OSError("zip: Archive has no files.")
+    if len(members) > 1:
+        logger.warning(f"zip: Archive has {len(members)} files. Reading only the first, '{members[0].filename}'.")
+    return _readahead(archive.open(members[0]), threads)
+
+def lzma_file(f, threads=0):
+    import lzma
+    return _readahead(lzma.LZMAFile(f), threads)
+
+def zstd_file(f, threads=0):
+    """zstd from the standard library (Python >= 3.14)."""
+    from compression import zstd
+    return _readahead(zstd.ZstdFile(f), threads)
+
+def zstandard_stream(f, threads=0):
+    import zstandard
+    return _readahead(io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f)), threads)
+
+
+register_codec("gz",   b"\x1f\x8b\x08",              isal_gzip, zlib_ng_gzip, zlib_gzip)
+register_codec("bz2",  b"\x42\x5a\x68",              bz2_file)
+register_codec("zip",  b"\x50\x4b\x03\x04",          zip_file)
+register_codec("xz",   b"\xfd\x37\x7a\x58\x5a\x00",  lzma_file)
+register_codec("zstd", b"\x28\xb5\x2f\xfd",          zstd_file, zstandard_stream)
+
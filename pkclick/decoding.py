@@ -0,0 +1,109 @@
+###########################################################
+#
+# ---%%%  Decode error accounting for text input  %%%---
+#
+
+import codecs
+import io
+import itertools
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Undecodable bytes are replaced with '?'. Instead of logging every byte, each file gets its own DecodeErrorLog which
+# counts the replacements and keeps a few examples, and one summary is logged when the file is closed.
+# Modes for text_wrapper (and gzFile's decode_errors):
+#   "count"   : Replace with '?' and report a summary on close (default)
+#   "replace" : Python's own 'replace' handler ('�'), no accounting. Fastest on dirty input
+#   "strict"  : Raise UnicodeDecodeError on the first bad byte. Fastest on clean input
+# Any other registered codecs error handler name is passed straight to io.TextIOWrapper.
+
+DECODE_ERRORS = ("count", "replace", "strict")
+
+_logs = weakref.WeakValueDictionary() # Registered handler name -> the DecodeErrorLog using it
+_free = []                            # Registered handler names which no DecodeErrorLog is using
+
+
+#
+# -%  CLASS: DecodeErrorLog  %-
+
+class DecodeErrorLog(object):
+    """A codecs error handler which counts the undecodable bytes it replaces and samples a few of them.
+    Each instance gets a handler name (self.errors), which is what io.TextIOWrapper(errors=) takes. codecs has no way to
+    unregister a handler, so the names are registered once and reused: A name goes back to the pool when the instance
+    using it is garbage collected, so there are only ever as many names as files open at the same time."""
+    _serial = itertools.count()
+
+    def __init__(self, name=None, examples=5, context=16, errors=None):
+        """name: Name of the file, for the report. examples: How many examples to keep, with context bytes around them."""
+        self.name = name
+        self.count = 0
+        self.examples = []
+        self.max_examples = examples
+        self.context = context
+        if errors is not None:
+            self.errors = errors
+            codecs.register_error(errors, self)
+            return
+        try:
+            self.errors = _free.pop()
+        except IndexError:
+            self.errors = f"pkclick-decode-{next(self._serial)}"
+            codecs.register_error(self.errors, _handler(self.errors))
+        _logs[self.errors] = self
+        weakref.finalize(self, _free.append, self.errors)
+
+    def __call__(self, exc):
+        if not isinstance(exc, UnicodeDecodeError):
+            raise exc
+        self.count += exc.end - exc.start
+        if len(self.examples) < self.max_examples:
+            self.examples.append(bytes(exc.object[max(0, exc.start - self.context):exc.end + self.context]))
+        return ("?", exc.end)
+
+    def report(self):
+        """Log a summary, if anything was replaced."""
+        if self.count:
+            logger.warning(f"Replaced {self.count} undecodable byte(s) with '?' in '{self.name}'.")
+            for example in self.examples:
+                logger.info(f"  Undecodable byte(s) found in: {example!r}")
+
+
+
+#
+# -%  CLASS: TextIOWrapper  %-
+
+class TextIOWrapper(io.TextIOWrapper):
+    """io.TextIOWrapper which reports the decode errors of its DecodeErrorLog when it is closed."""
+    def __init__(self, buffer, *args, decode_log=None, **kwargs):
+        super().__init__(buffer, *args, **kwargs)
+        self.decode_log = decode_log
+
+    def close(self):
+        if not self.closed and self.decode_log is not None:
+            self.decode_log.report()
+            self.decode_log = None
+        super().close()
+
+
+
+#
+# -%  Helper functions  %-
+
+def _handler(name):
+    """The codecs error handler registered as name: It passes the errors on to the DecodeErrorLog using that name."""
+    def handler(exc):
+        log = _logs.get(name)
+        if log is None or not isinstance(exc, UnicodeDecodeError):
+            raise exc
+        return log(exc)
+    return handler
+
+def text_wrapper(buffer, errors="count", **kwargs):
+    """Wrap the binary stream buffer in a text stream, handling undecodable bytes as given by errors (see DECODE_ERRORS)."""
+    if errors != "count":
+        return io.TextIOWrapper(buffer, errors=errors, **kwargs)
+    log = DecodeErrorLog(name=getattr(buffer, "name", buffer))
+    return TextIOWrapper(buffer, errors=log.errors, decode_log=log, **kwargs)
+
@@ -0,0 +1,263 @@
+###########################################################
+#
+# ---%%%  Opt-in I/O metrics for the pkclick file types  %%%---
+#
+
+import io
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Usage: Turn on with metrics.enable() (or PKLIB_METRICS=1 in the environment) before the click command runs, eg:
+#   pkclick.metrics.enable(callback=lambda m: print(m.as_dict()))   # Also prints a summary of all files at exit
+# Each file opened by gzFile, isalFile, CSViter, CSVFile, BED3 or VCFFile then gets a FileMetrics with:
+#   compressed_bytes, uncompressed_bytes : Bytes read from the file, and after decompression (VCFFile: file size, and 0)
+#   rows                                 : Rows (lines, records) handed to the caller
+#   seconds["read" | "decompress" | "parse"] : Time spent reading the file, decompressing it, and decoding plus parsing
+# Time is only counted while the caller waits for data. With threads > 0, reading and decompressing run in the background,
+# so the decompress stage is the time spent waiting for the background threads.
+# When turned off, the file types return their usual objects and nothing is wrapped.
+
+_enabled = False
+_callback = None
+tracked = []
+
+def enable(callback=None, summary=True):
+    """Start recording. callback(metrics) is called with each file's FileMetrics when it is closed or read to the end.
+    summary: Print a summary of all files to stderr when the program exits."""
+    import atexit
+    global _enabled, _callback
+    (_enabled, _callback) = (True, callback)
+    atexit.unregister(_summary)
+    if summary:
+        atexit.register(_summary)
+
+def disable():
+    global _enabled, _callback
+    (_enabled, _callback) = (False, None)
+
+def enabled():
+    return _enabled
+
+def track(name, kind):
+    """Return a new FileMetrics for a file, or None if metrics are turned off."""
+    if not _enabled:
+        return None
+    metrics = FileMetrics(name, kind)
+    tracked.append(metrics)
+    return metrics
+
+def summary():
+    """Return a table with the metrics of all tracked files."""
+    lines = [f"{'file':40} {'type':9} {'compressed':>12} {'uncompressed':>13} {'rows':>11} {'read s':>8} {'decomp s':>8} {'parse s':>8} {'rows/s':>10}"]
+    for m in tracked:
+        s = m.seconds
+        lines.append(f"{str(m.name)[-40:]:40} {m.kind:9} {m.compressed_bytes:>12} {m.uncompressed_bytes:>13} {m.rows:>11} "
+                     f"{s['read']:>8.3f} {s['decompress']:>8.3f} {s['parse']:>8.3f} {m.rows_per_sec:>10.0f}")
+    return "\n".join(lines)
+
+def _summary():
+    import click
+    if tracked:
+        click.echo(f"pkclick I/O metrics:\n{summary()}", err=True)
+
+
+
+#
+# -%  CLASS: FileMetrics  %-
+
+class FileMetrics(object):
+    """Counters and stage timers for one file."""
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.compressed_bytes = 0
+        self._uncompressed_bytes = None
+        self.rows = 0
+        self._time = {"read": 0.0, "decompress": 0.0, "rows": 0.0} # Inclusive: each stage includes the ones below it
+        self.size = None # Optional callable returning compressed_bytes, for files read by other libraries (eg. pysam)
+        self._done = False
+
+    @property
+    def uncompressed_bytes(self):
+        return self.compressed_bytes if self._uncompressed_bytes is None else self._uncompressed_bytes
+
+    @uncompressed_bytes.setter
+    def uncompressed_bytes(self, value):
+        self._uncompressed_bytes = value
+
+    @property
+    def seconds(self):
+        """Time spent in each stage, excluding the stages below it."""
+        (read, decompress, rows) = (self._time["read"], self._time["decompress"] or self._time["read"], self._time["rows"])
+        return {"read": read, "decompress": max(decompress - read, 0.0), "parse": max(rows - decompress, 0.0) if rows else 0.0}
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self._time["rows"] if self._time["rows"] else 0.0
+
+    def as_dict(self):
+        return {"name": self.name, "kind": self.kind, "compressed_bytes": self.compressed_bytes, "uncompressed_bytes": self.uncompressed_bytes,
+                "rows": self.rows, "seconds": self.seconds, "rows_per_sec": self.rows_per_sec}
+
+    def finish(self):
+        """Called when the file is closed or read to the end; runs the callback once."""
+        if self.size is not None:
+            self.compressed_bytes = self.size()
+        if not self._done:
+            self._done = True
+            logger.debug(f"metrics: {self.as_dict()}")
+            if _callback is not None:
+                _callback(self)
+
+
+
+#
+# -%  CLASS: MeteredStream  %-
+
+class MeteredStream(io.RawIOBase):
+    """Wraps a binary stream, counting the bytes read and the time spent reading them.
+    stage: 'read' for the file itself (compressed bytes), 'decompress' for the decompressed stream."""
+    def __init__(self, stream, metrics, stage):
+        super().__init__()
+        self._stream = stream
+        self._metrics = metrics
+        self._stage = stage
+        if stage == "decompress":
+            metrics.uncompressed_bytes = 0
+
+    @property
+    def name(self):
+        return getattr(self._stream, "name", None)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._stream.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._stream.seek(offset, whence)
+
+    def tell(self):
+        return self._stream.tell()
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self._stream.read(size)
+        self._count(len(data), start)
+        return data
+
+    def read1(self, size=-1):
+        start = time.perf_counter()
+        data = getattr(self._stream, "read1", self._stream.read)(size)
+        self._count(len(data), start)
+        return data
+
+    def readinto(self, b):
+        start = time.perf_counter()
+        n = self._stream.readinto(b)
+        self._count(n or 0, start)
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            self._metrics.finish()
+        super().close()
+
+    def _count(self, n, start):
+        m = self._metrics
+        m._time[self._stage] += time.perf_counter() - start
+        if self._stage == "read":
+            m.compressed_bytes += n
+        else:
+            m._uncompressed_bytes += n
+
+
+
+#
+# -%  CLASS: MeteredRows  %-
+
+class MeteredRows(object):
+    """Wraps an iterator of rows (eg. a pkcsv reader or a pysam VariantFile), counting rows and the time spent producing them.
+    Other attributes are passed through to the wrapped object, and so are + (eg. BED3iter's chaining) and isinstance:
+    __class__ is that of the wrapped object, so isinstance(rows, BED3iter) holds whether or not metrics are on."""
+    def __init__(self, rows, metrics):
+        self._rows = rows
+        self._iter = None
+        self._metrics = metrics
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = next(self._iter or self._start())
+        except StopIteration:
+            self._metrics._time["rows"] += time.perf_counter() - start
+            self._metrics.finish()
+            raise
+        self._metrics._time["rows"] += time.perf_counter() - start
+        self._metrics.rows += 1
+        return row
+
+    def __getattr__(self, name):
+        return getattr(self._rows, name)
+
+    @property
+    def __class__(self):
+        return type(self._rows)
+
+    def __add__(self, other):
+        return self._forward("__add__", other)
+
+    def __radd__(self, other):
+        return self._forward("__radd__", other)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        getattr(self._rows, "close", lambda: None)()
+        self._metrics.finish()
+
+    def _start(self):
+        self._iter = iter(self._rows)
+        return self._iter
+
+    def _forward(self, name, *args):
+        """Call the special method name of the wrapped object's class, with this wrapper as self so that the rows are still
+        counted. Classes written in C won't take the wrapper; their method is called on the wrapped object instead."""
+        method = getattr(type(self._rows), name, None)
+        if method is None:
+            return NotImplemented
+        try:
+            return method(self, *args)
+        except TypeError:
+            return getattr(self._rows, name)(*args)
+
+
+
+#
+# -%  Helper functions  %-
+
+def text(f, metrics):
+    """Put a MeteredStream under the text file f (as opened by click.File), if it is a plain io.TextIOWrapper. Returns the text file."""
+    if type(f) is not io.TextIOWrapper or not f.readable():
+        return f
+    (encoding, errors, newline) = (f.encoding, f.errors, None)
+    return io.TextIOWrapper(MeteredStream(f.detach(), metrics, "read"), encoding=encoding, errors=errors, newline=newline)
+
+def _init():
+    import os
+    if os.environ.get("PKLIB_METRICS", "").lower() not in ("", "0", "false", "no"):
+        enable()
+
+_init()
+
@@ -0,0 +1,294 @@
+###########################################################
+#
+# ---%%%  Local cache for PGS Catalog scoring files: The raw downloads and their parsed columns  %%%---
+#
+
+import contextlib
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Usage: fetch("PGS000001", build="GRCh38") returns the path of the scoring file, downloading it only if it isn't cached.
+# load(path) returns a PGSScore with the variants and weights of a scoring file. The first load parses the text file and
+# saves its columns as .npy arrays; later loads memory-map those, so they take milliseconds however large the score is.
+# The cache directory is (first one set): The directory argument, $PKLIB_PGS_CACHE, $XDG_CACHE_HOME/pklib/pgs, ~/.cache/pklib/pgs
+#   downloads/PGS000001_hmPOS_GRCh38.txt.gz  : Raw scoring files, as downloaded
+#   parsed/v1/<sha256>/                      : Parsed columns, keyed by the sha256 of the raw file, so local files are cached too
+#   parsed/v1/stat/<key>                     : The sha256 of a file, keyed by its path, size and mtime, so it is hashed only once
+# Files and directories only appear in the cache by atomic rename, and a lock makes concurrent jobs wait for the one that is
+# downloading or parsing, instead of repeating the work. Deleting the cache directory (or any part of it) is always safe.
+
+FORMAT = "v1" # Bump when the parsed layout changes; old entries are then ignored
+COLUMNS = ("chrom", "pos", "effect_allele", "other_allele", "ID", "weights")
+
+def cache_dir(directory=None):
+    """Return the cache directory as a Path, creating it if needed."""
+    if directory is None:
+        directory = os.environ.get("PKLIB_PGS_CACHE") or os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pklib", "pgs")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+def filename(accession, build=None):
+    """Name of the scoring file for accession, as the PGS Catalog names it. build: None for the author-reported positions,
+    or 'GRCh37'/'GRCh38' for the harmonized file."""
+    return f"{accession}.txt.gz" if build is None else f"{accession}_hmPOS_{build}.txt.gz"
+
+def cached(accession, directory=None, build=None):
+    """Return the path of the cached scoring file for accession, or None if it hasn't been downloaded."""
+    path = cache_dir(directory) / "downloads" / filename(accession, build)
+    return path if path.exists() else None
+
+def fetch(accession, directory=None, build=None):
+    """Return the path of the scoring file for accession in the cache, downloading it with pgscatalog if it isn't there."""
+    import tempfile
+    if (path := cached(accession, directory, build)) is not None: # Complete, as files only appear by rename
+        return path
+    downloads = cache_dir(directory) / "downloads"
+    downloads.mkdir(exist_ok=True)
+    path = downloads / filename(accession, build)
+    with _lock(downloads / f".{path.name}.lock"):
+        if path.exists():
+            logger.debug(f"pgscache: '{path}' was downloaded by another job.")
+            return path
+        from pgscatalog.core import GenomeBuild, ScoringFile
+        pgs = ScoringFile(accession, target_build=None if build is None else GenomeBuild.from_string(build))
+        with tempfile.TemporaryDirectory(dir=downloads, prefix=".download-") as tmp:
+            pgs.download(tmp)
+            os.replace(pgs.local_path, path)
+    logger.info(f"pgscache: Downloaded {accession} to '{path}'.")
+    return path
+
+def load(path, directory=None):
+    """Return a PGSScore for the scoring file at path. Memory-mapped from the cache if it has been parsed before;
+    otherwise parsed and saved. If the cache can't be written, the parsed columns are returned from memory."""
+    import shutil
+    import tempfile
+    try:
+        root = cache_dir(directory) / "parsed" / FORMAT
+        root.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"pgscache: Cache directory not writable, parsing '{path}' without caching: {e}")
+        return PGSScore(*parse(path))
+    digest = _digest(path, root / "stat")
+    entry = root / digest
+    if entry.exists():
+        return PGSScore.open(entry)
+    with _lock(root / f".{digest}.lock"):
+        if entry.exists():
+            return PGSScore.open(entry)
+        (meta, columns) = parse(path)
+        tmp = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+        try:
+            _save(tmp, meta, columns)
+            os.rename(tmp, entry)
+        except OSError as e:
+            logger.warning(f"pgscache: Could not save the parsed columns of '{path}': {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return PGSScore(meta, columns)
+    logger.debug(f"pgscache: Saved the parsed columns of '{path}' in '{entry}'.")
+    return PGSScore.open(entry)
+
+def sha256(path, size=1 << 20):
+    """Hex sha256 of the file at path."""
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while (block := f.read(size)):
+            h.update(block)
+    return h.hexdigest()
+
+
+
+#
+# -%  Parsing  %-
+
+def header(path):
+    """Return (meta, fields): The '#key=value' lines of the comment block as a dict, and the column names."""
+    meta = {}
+    with _open(path) as f:
+        for line in f:
+            if not line.startswith("#"):
+                return (meta, line.rstrip("\r\n").split("\t"))
+            (key, sep, value) = line.lstrip("#").rstrip("\r\n").partition("=")
+            if sep:
+                meta[key.strip()] = value.strip()
+    raise ValueError(f"pgscache: No header line found in '{path}'.")
+
+def parse(path, batch=100_000):
+    """Parse a scoring file into (meta, columns). The columns are numpy arrays:
+      chrom, effect_allele, other_allele : int32 codes (-1 for missing) into meta['categories'][column]
+      pos     : int64 positions (0 for missing)
+      ID      : bytes (the rsID column), or absent if the file has none
+      weights : float64 of shape (variants, scores); one score per effect_weight column, named in meta['accessions']
+    Harmonized positions (hm_chr, hm_pos, hm_rsID) are used when the file has them."""
+    import numpy as np
+    import pklib.pkcsv as csv
+    (meta, fields) = header(path)
+    pick = lambda *names: next((name for name in names if name in fields), None)
+    sources = {"chrom": pick("hm_chr", "chr_name"), "pos": pick("hm_pos", "chr_position"), "ID": pick("hm_rsID", "rsID"),
+               "effect_allele": pick("effect_allele"), "other_allele": pick("other_allele", "hm_inferOtherAllele")}
+    weights = [name for name in fields if name == "effect_weight" or name.startswith("effect_weight_")]
+    if sources["effect_allele"] is None or not weights:
+        raise ValueError(f"pgscache: '{path}' has no effect_allele or effect_weight column.")
+    sources = {column: name for (column, name) in sources.items() if name is not None}
+    dtypes = {name: "category" for column in ("chrom", "effect_allele", "other_allele") if (name := sources.get(column))}
+    dtypes.update({name: "float" for name in weights + [sources.get("pos")] if name})
+    if "ID" in sources:
+        dtypes[sources["ID"]] = "str"
+    blocks = {name: [] for name in list(sources.values()) + weights}
+    with _open(path) as f:
+        rows = csv.reader(f, comment_char="#", delimiter="\t")
+        for block in rows.read_batches(batch, usecols=list(blocks), header=True, dtypes=dtypes):
+            for (name, values) in block.items():
+                blocks[name].append(values if name != sources.get("ID") else np.char.encode(values))
+        categories = {column: rows.categories.get(sources.get(column), []) for column in ("chrom", "effect_allele", "other_allele")}
+    concat = lambda name, dtype: np.concatenate(blocks[name]) if blocks[name] else np.empty(0, dtype=dtype)
+    n = len(concat(weights[0], np.float64))
+    columns = {column: concat(sources[column], np.int32) if column in sources else np.full(n, -1, dtype=np.int32) for column in categories}
+    columns["pos"] = np.nan_to_num(concat(sources["pos"], np.float64), nan=0).astype(np.int64) if "pos" in sources else np.zeros(n, dtype=np.int64)
+    if "ID" in sources:
+        columns["ID"] = concat(sources["ID"], "S1")
+    columns["weights"] = np.column_stack([concat(name, np.float64) for name in weights])
+    accessions = [meta.get("pgs_id", Path(path).name.split(".")[0])] if weights == ["effect_weight"] else [name[len("effect_weight_"):] for name in weights]
+    meta = {"header": meta, "source": str(path), "columns": sources, "categories": categories, "accessions": accessions}
+    logger.info(f"pgscache: Parsed {n} variants and {len(weights)} score(s) from '{path}'.")
+    return (meta, columns)
+
+def _digest(path, directory):
+    """sha256 of the file at path, remembered in directory under its path, size and mtime; the file is only read on a miss."""
+    import hashlib
+    import tempfile
+    stat = os.stat(path)
+    key = hashlib.sha256(f"{os.path.realpath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()).hexdigest()
+    try:
+        return (Path(directory) / key).read_text().strip()
+    except OSError:
+        pass
+    digest = sha256(path)
+    try:
+        Path(directory).mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=directory, prefix=".tmp-", delete=False) as f:
+            f.write(digest)
+        os.replace(f.name, Path(directory) / key)
+    except OSError as e:
+        logger.debug(f"pgscache: Could not remember the sha256 of '{path}': {e}")
+    return digest
+
+def _open(path):
+    """Open a (possibly compressed) text file for reading."""
+    import io
+    from .compression import open_stream
+    return io.TextIOWrapper(open_stream(open(path, "rb")), encoding="utf-8", newline="")
+
+def _save(directory, meta, columns):
+    import json
+    import numpy as np
+    for (column, values) in columns.items():
+        np.save(os.path.join(directory, f"{column}.npy"), values)
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+@contextlib.contextmanager
+def _lock(path):
+    """Hold an exclusive lock on the file path while in the block; other processes wait for it.
+    Without fcntl (Windows) nothing is locked, but the atomic renames still keep the cache consistent."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+
+#
+# -%  CLASS: PGSScore  %-
+
+class PGSScore(object):
+    """The variants and weights of a parsed scoring file, as columns. See parse() for the columns.
+    Opened from the cache, the columns are read-only memory maps; nothing is read until it is used."""
+    def __init__(self, meta, columns):
+        self.meta = meta
+        self._columns = columns
+
+    @classmethod
+    def open(cls, directory):
+        """Memory-map the columns saved in directory."""
+        import json
+        import numpy as np
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        columns = {column: np.load(path, mmap_mode="r") for column in COLUMNS if os.path.exists(path := os.path.join(directory, f"{column}.npy"))}
+        return cls(meta, columns)
+
+    def __len__(self):
+        return len(self._columns["pos"])
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.pgs_id!r}, variants={len(self)}, accessions={self.accessions})"
+
+    @property
+    def pgs_id(self):
+        return self.meta["header"].get("pgs_id")
+
+    @property
+    def genome_build(self):
+        """The build of the positions: HmPOS_build for harmonized files, else the author-reported genome_build."""
+        header = self.meta["header"]
+        return header.get("HmPOS_build") if "hm_pos" in self.meta["columns"].values() else header.get("genome_build")
+
+    @property
+    def accessions(self):
+        """Names of the scores, one per column of weights."""
+        return self.meta["accessions"]
+
+    @property
+    def chrom(self):
+        """Chromosome of every variant as an object array (None if missing)."""
+        return self._decode("chrom")
+
+    @property
+    def chrom_codes(self):
+        return self._columns["chrom"]
+
+    @property
+    def pos(self):
+        return self._columns["pos"]
+
+    @property
+    def effect_allele(self):
+        return self._decode("effect_allele")
+
+    @property
+    def other_allele(self):
+        return self._decode("other_allele")
+
+    @property
+    def ID(self):
+        """The rsIDs as a bytes array, or None if the file has none."""
+        return self._columns.get("ID")
+
+    @property
+    def weights(self):
+        """Effect weights as a float64 array of shape (variants, scores)."""
+        return self._columns["weights"]
+
+    def categories(self, column):
+        """The labels of the codes in a category column (chrom, effect_allele or other_allele)."""
+        return self.meta["categories"][column]
+
+    def codes(self, column):
+        return self._columns[column]
+
+    def _decode(self, column):
+        import numpy as np
+        return np.array(self.categories(column) + [None], dtype=object)[self._columns[column]]
+
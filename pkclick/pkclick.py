@@ -3,15 +3,28 @@
 # --%% pkclick.py  %%--
 #
  
-__version__ = "1.6.0"
+__version__ = "1.14.0"
 # 1.4 : Added CSVList to the family
 # 1.5 : Found and fixed some big bugs like sniffer failing and SampleList not being idempotent
 # 1.6 : Basic cleaning - Moved some functions out of pkclick.py file
-
+# 1.7 : Threaded decompression in gzFile and isalFile, parallel for BGZF input
+# 1.8 : gzFile decompresses bz2, zip, xz and zstd via the codec registry in compression.py
+# 1.9 : gzFile(region=...) reads only a region of indexed BGZF files
+# 1.10: Decode errors are counted per file and reported once, instead of logged (slowly) byte by byte
+# 1.11: Opt-in I/O metrics, see metrics.py
+# 1.12: SampleList reads VCF samples from the header only, without PyVCF, and caches them
+# 1.13: PGSFile downloads to a local cache and can return the parsed score as memory-mapped columns, see pgscache.py
+# 1.14: VCFFile.map_regions runs a function over balanced regions of indexed VCF/BCF files in parallel, see vcfregions.py
+
+import atexit
 import click
-import codecs
+import itertools
 import logging
 
+from .compression import MAGIC
+from .decoding import DecodeErrorLog, text_wrapper
+from .metrics import MeteredRows, MeteredStream, text, track
+
 logger = logging.getLogger(__name__)
 
 # NOTE: Here's some fun. All click type extenders must obey these guys:
@@ -25,35 +38,51 @@ logger = logging.getLogger(__name__)
 #
 # -%  Class pkclick.gzFile  %-
 
-def unicodeerror_handler(exc): 
-    logger.warning(f"Current codec '{exc.encoding}' can't decode byte {exc.object[exc.start:exc.end]} found in input. Byte will be replaced with '?'.")
-    logger.info(f"{exc.object[0:exc.start]}?{exc.object[exc.end:]}")
-    return (f"{exc.object[0:exc.start]}?{exc.object[exc.end:]}", exc.end)
-
-codecs.register_error("UnicodeError", unicodeerror_handler)
+# Kept for code opening files with errors='UnicodeError'. Replaces bad bytes with '?' and reports once at exit.
+# gzFile gives each file its own DecodeErrorLog instead, see decoding.py.
+unicodeerror_handler = DecodeErrorLog(name="input", errors="UnicodeError")
+atexit.register(unicodeerror_handler.report)
 
 
 class gzFile(click.File):
-    """A Class for detecting compressed files and automagically decrompress them."""
-    magic_dict = {
-        b"\x1f\x8b\x08"     : "gz",
-        b"\x42\x5a\x68"     : "bz2",
-        b"\x50\x4b\x03\x04" : "zip"
-    }
+    """A Class for detecting compressed files and automagically decrompress them.
+       The format is found from the magic bytes in pkclick.compression (gz, bz2, zip, xz and zstd, plus any registered
+       codecs) and decompressed with the fastest backend installed (eg. isal > zlib-ng > zlib for gz).
+       With threads > 0, decompression runs on background threads with read-ahead; BGZF input is decompressed
+       block by block in parallel on that many threads.
+       With region (eg. 'chr7:100000-200000'), an indexed BGZF file is restricted to the header and the lines overlapping
+       the region, decompressing only the blocks needed. See pkclick.region for building the index.
+       decode_errors: 'count' replaces undecodable bytes with '?' and logs one summary per file when it is closed;
+       'replace' and 'strict' use Python's own handlers, skipping the accounting. See pkclick.decoding."""
+    magic_dict = MAGIC # Shared with the codec registry, so registered codecs are detected too
+
+    def __init__(self, *args, threads=0, region=None, decode_errors="count", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = threads
+        self.region = region
+        self.decode_errors = decode_errors
 
     def convert(self, value, param, ctx):
         """Converts (extracts) compressed input."""
-        import gzip
-        import io
         f = super().convert(value, param, ctx)
         try: logger.info(f" Reading from '{f.name}'")
         except AttributeError: logger.info(f"Reading from'{f}'")
+        if self.region is not None:
+            return self._open_region(f, self.region, param, ctx)
         try:
-            if self._getziptype(f, self.magic_dict) is not None:
-                return io.TextIOWrapper(gzip.GzipFile(fileobj=f), errors='UnicodeError')
+            return self._open(f, self.threads, self.decode_errors)
         except UnicodeDecodeError:
             self.fail("Could not interpret input. Did you remember to use binary mode? eg gzFile(mode='rb')")
-        return io.TextIOWrapper(f, errors='UnicodeError')
+
+    def _open_region(self, f, region, param, ctx):
+        """Return a text stream with the header and the lines of f overlapping region."""
+        from .region import open_region
+        try:
+            stream = open_region(f.name, region, threads=self.threads or 1)
+        except (AttributeError, FileNotFoundError, ValueError) as e:
+            self.fail(f"Could not read region '{region}' from '{getattr(f, 'name', f)}': {e}", param, ctx)
+        f.close()
+        return stream
 
     @staticmethod
     def _getziptype(f, magic_dict):
@@ -70,19 +99,33 @@ class gzFile(click.File):
         return None
 
     @classmethod
-    def cast(cls, fobj):
+    def _decompress(cls, f, threads=0):
+        """Return a binary stream decompressing f; on background threads if threads > 0."""
+        from .compression import CODECS
+        return CODECS[cls._getziptype(f, cls.magic_dict)].open(f, threads=threads)
+
+    @classmethod
+    def cast(cls, fobj, threads=0, decode_errors="count"):
         """Cast most file objects into a fileobject processed by gzFile."""
-        import gzip
-        import io
         try: logger.info(f"Reading from '{fobj.name}'")
         except AttributeError: logger.info(f"Reading from'{fobj}'")
         try:
-            if cls._getziptype(fobj, cls.magic_dict) is not None:
-                return io.TextIOWrapper(gzip.GzipFile(fileobj=fobj), errors='UnicodeError')
+            return cls._open(fobj, threads, decode_errors)
         except UnicodeDecodeError:
             logger.error("Could not interpret input. Did you remember to use binary mode? eg gzFile(mode='rb')")
             exit(1)
-        return io.TextIOWrapper(fobj, errors='UnicodeError')
+
+    @classmethod
+    def _open(cls, f, threads=0, decode_errors="count"):
+        """Return a text stream over f, decompressing it if needed. Bytes and time are recorded if pkclick.metrics is enabled."""
+        metrics = track(getattr(f, "name", f), cls.__name__)
+        if metrics is not None:
+            f = MeteredStream(f, metrics, "read")
+        if cls._getziptype(f, cls.magic_dict) is not None:
+            f = cls._decompress(f, threads)
+            if metrics is not None:
+                f = MeteredStream(f, metrics, "decompress")
+        return text_wrapper(f, errors=decode_errors)
 
 
 
@@ -90,21 +133,15 @@ class gzFile(click.File):
 # -%  CLASS: pkclick.isalFile
 
 class isalFile(gzFile):
-    """A Class for detecting compressed files and automagically decrompress them. Like gzFile but faster."""
+    """A Class for detecting compressed files and automagically decrompress them. Like gzFile but always uses isal for gz.
+       NB: gzFile picks isal by itself when it is installed."""
 
-    def convert(self, value, param, ctx):
-        """Converts (extracts) compressed input."""
-        from isal import igzip
-        import io
-        f = super(gzFile, self).convert(value, param, ctx)
-        try: logger.info(f" Reading from '{f.name}'")
-        except AttributeError: logger.info(f"Reading from'{f}'")
-        try:
-            if self._getziptype(f, self.magic_dict) is not None:
-                return io.TextIOWrapper(igzip.IGzipFile(fileobj=f), errors='UnicodeError')
-        except UnicodeDecodeError:
-            self.fail("Could not interpret input. Did you remember to use binary mode? eg gzFile(mode='rb')")
-        return io.TextIOWrapper(f, errors='UnicodeError')
+    @classmethod
+    def _decompress(cls, f, threads=0):
+        """Return a binary stream decompressing f, using isal for gz input."""
+        from .compression import CODECS
+        filetype = cls._getziptype(f, cls.magic_dict)
+        return CODECS[filetype].open(f, threads=threads, backend="isal_gzip" if filetype == "gz" else None)
 
 
 
@@ -134,15 +171,23 @@ class CSV(click.ParamType):
 class CSVFile(click.File):
     """A class for opening files and automatically push them through my csv package. File should have a headline used to create the keys for the dict from DictReader.
        Output: An object which behaves like a DictReader."""
+    def __init__(self, *args, usecols=None, compact=False, **kwargs):
+        """usecols: Only read these columns. compact: Return compact pkcsv.Row objects instead of dicts."""
+        super().__init__(*args, **kwargs)
+        self.usecols = usecols
+        self.compact = compact
+
     def convert(self, value, param, ctx):
         """Convert by calling DictReader on filehandle."""
         import pklib.pkcsv as csv
-        if value is None or isinstance(value, csv.DictReader):
+        if value is None or isinstance(value, (csv.DictReader, MeteredRows)):
             return value
         try:
             f = super().convert(value, param, ctx)
             logging.debug(f"CSVFile: Reading data table from '{f.name}'")
-            return csv.DictReader(f, comment_char="#")
+            if (metrics := track(f.name, "CSVFile")) is not None:
+                return MeteredRows(csv.DictReader(text(f, metrics), comment_char="#", usecols=self.usecols, compact=self.compact), metrics)
+            return csv.DictReader(f, comment_char="#", usecols=self.usecols, compact=self.compact)
         except Exception as e:
             logging.debug(e)
             self.fail(f"ERROR: Unable to open '{value}' as a column-based text file.")
@@ -153,23 +198,38 @@ class CSVFile(click.File):
 # -%  CLASS: SampleList  %-
 
 class SampleList(gzFile):
-    """Obtain a list of samples from a file (or '-'... maybe?)."""
+    """Obtain a list of samples from a file (or '-'... maybe?).
+       For VCF input (also bgzipped) only the header is read, and the samples are cached in '<input>.samples.json',
+       keyed by the path, size and modification time of the input, so later runs don't read the VCF at all."""
+    CACHE_SUFFIX = ".samples.json"
+
+    def __init__(self, *args, cache=True, **kwargs):
+        """cache: Read and write the sample cache for VCF input."""
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
     def convert(self, value, param, ctx):
         """Expects value to be a file with single-column input (Or a VCF file with samples), and returns a list with each line from file."""
         if value is None or isinstance(value, list):
             return value
+        if self.cache and (samples := self._readCache(value)) is not None:
+            logger.info(f"SampleList: Read {len(samples)} sample identifiers from cache '{value}{self.CACHE_SUFFIX}'.")
+            return samples
+        stat = self._stat(value)
         f = super().convert(value, param, ctx)
         logger.debug(f"SampleList: Input is seekable = {f.seekable()}.")
-        if self._isVCF(f):
+        first = f.readline()
+        if first.startswith("##fileformat=VCF"):
             logger.info("SampleList: Treating samples file as VCF.")
-            try:
-                import vcf
-                vcf_r = vcf.Reader(f, compressed=False)
-                record = next(vcf_r)
-                samples = [subject.sample for subject in record.samples]
-            except ImportError:
-                self.fail("Encountered VCF imput but could not find the PyVCF module. Either install with 'pip install PyVCF' or provide different input.")
-        elif self._isTable(f):
+            samples = self._vcfSamples(f)
+            if samples is None:
+                self.fail("Could not find the '#CHROM' header line in VCF input.", param, ctx)
+            if self.cache and stat is not None:
+                self._writeCache(value, stat, samples)
+        elif not f.seekable():
+            logger.info("SampleList: Treating samples file as list of plain IDs.")
+            samples = [line.rstrip() for line in itertools.chain([first], f)]
+        elif self._isTable(self._rewind(f)):
             import pklib.pkcsv as csv
             riter = csv.reader(f)
             hdr = next(riter)[0]
@@ -184,15 +244,69 @@ class SampleList(gzFile):
 #       self.fail("Could not parse input. Please try a different file format.")
 
     @staticmethod
-    def _isVCF(f):
-        """Is f a VCF file? Returns 'None' if it couldn't check f."""
-        if f.seekable():
-            file_sample = f.readline()
-            f.seek(0)
-            logger.debug(f"SampleList: isVCF = {file_sample.startswith('##fileformat=VCFv4')}")
-            return file_sample.startswith("##fileformat=VCFv4")
+    def _vcfSamples(f):
+        """Read the samples from the '#CHROM' line of a VCF file, skipping the other header lines. Returns None if there is none."""
+        for line in f:
+            if line.startswith("#CHROM"):
+                return line.rstrip("\r\n").split("\t")[9:]
+            if not line.startswith("##"):
+                return None
+        return None
+
+    @staticmethod
+    def _rewind(f):
+        f.seek(0)
+        return f
+
+    @staticmethod
+    def _stat(path):
+        """Return the cache key of the regular file path: (absolute path, size, mtime_ns). None if path isn't a regular file."""
+        import os
+        import stat
+        try:
+            st = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    @classmethod
+    def _readCache(cls, path):
+        """Return the cached samples for path, or None if there is no cache or it is out of date."""
+        import json
+        if (key := cls._stat(path)) is None:
+            return None
+        try:
+            with open(f"{path}{cls.CACHE_SUFFIX}") as f:
+                cache = json.load(f)
+            if (cache["path"], cache["size"], cache["mtime_ns"]) == key:
+                return cache["samples"]
+            logger.debug(f"SampleList: Cache '{path}{cls.CACHE_SUFFIX}' is out of date.")
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
         return None
 
+    @classmethod
+    def _writeCache(cls, path, key, samples):
+        """Write the samples next to path. Written to a temporary file and renamed, so readers never see half a cache.
+        Skipped (with a debug message) if the directory isn't writable."""
+        import json
+        import os
+        import tempfile
+        (abspath, size, mtime_ns) = key
+        tmp = None
+        try:
+            (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(abspath), prefix=".pkclick-", suffix=cls.CACHE_SUFFIX)
+            with os.fdopen(fd, "w") as out:
+                json.dump({"path": abspath, "size": size, "mtime_ns": mtime_ns, "samples": samples}, out)
+            os.replace(tmp, f"{path}{cls.CACHE_SUFFIX}")
+            logger.debug(f"SampleList: Wrote cache '{path}{cls.CACHE_SUFFIX}'.")
+        except OSError as e:
+            logger.debug(f"SampleList: Could not write cache for '{path}': {e}")
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
     @staticmethod
     def _isTable(f):
         """Is f a tsv/csv file? Returns 'None' if it couldn't check f."""
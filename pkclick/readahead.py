@@ -0,0 +1,77 @@
+###########################################################
+#
+# ---%%%  Class ReadAheadReader: Read a stream on a background thread  %%%---
+#
+
+import io
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+#
+# -%  CLASS: ReadAheadReader  %-
+
+class ReadAheadReader(io.RawIOBase):
+    """Reads a binary stream (eg. a GzipFile) on a background thread, so decompression overlaps with parsing.
+       Up to depth blocks of block_size bytes are kept ready. Wrap in io.BufferedReader before handing it to io.TextIOWrapper."""
+    def __init__(self, stream, block_size=1 << 20, depth=4):
+        super().__init__()
+        self._stream = stream
+        self._queue  = queue.Queue(depth)
+        self._stop   = threading.Event()
+        self._buffer = memoryview(b"")
+        self._done   = False
+        self._thread = threading.Thread(target=self._run, args=(block_size,), name="pkclick-readahead", daemon=True)
+        self._thread.start()
+
+    @property
+    def name(self):
+        return getattr(self._stream, "name", None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            if self._done:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._done = True
+                raise item
+            if not item:
+                self._done = True
+                return 0
+            self._buffer = memoryview(item)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join(timeout=1)
+        super().close()
+
+    def _run(self, block_size):
+        """Background thread: read blocks until EOF (an empty block), an error, or close()."""
+        try:
+            while not self._stop.is_set():
+                data = self._stream.read(block_size)
+                self._put(data)
+                if not data:
+                    return
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item):
+        """Put item in the queue, giving up if the reader is closed while the queue is full."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
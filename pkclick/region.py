@@ -0,0 +1,191 @@
+###########################################################
+#
+# ---%%%  Region queries on bgzipped tables  %%%---
+#
+
+import io
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Usage: Index a bgzipped, coordinate sorted table once, then read only the lines overlapping a region, eg:
+#   build_index("scores.tsv.gz", seq=0, start=1, end=None, zero_based=False)    # Writes scores.tsv.gz.gzi and scores.tsv.gz.pki
+#   f = open_region("scores.tsv.gz", "chr7:100000-200000")                      # Text stream; header lines first, then the hits
+# A tabix index (.tbi or .csi, eg. from 'tabix -p bed') is used instead if there is one, through pysam.
+# The local index (.pki) is a linear index like tabix': For every 16 kb window of a contig it holds the uncompressed
+# offset of the first line overlapping that window. The .gzi block index maps that offset to the block holding it.
+
+PKI_SUFFIX = ".pki"
+WINDOW = 14 # log2 of the window size
+
+def parse_region(region):
+    """Parse 'chr7:100000-200000' (1-based, inclusive, commas allowed), 'chr7:100000-' or 'chr7'.
+    Returns (chrom, start, end) as 0-based half-open coordinates; start and end are None if not given (the contig's ends)."""
+    match = re.fullmatch(r"\s*([^:\s]+)(?::([\d,]+)(?:-([\d,]*))?)?\s*", region)
+    if match is None:
+        raise ValueError(f"Could not parse region '{region}'. Expected eg. 'chr7:100000-200000'.")
+    (chrom, start, end) = match.groups()
+    start = int(start.replace(",", "")) - 1 if start else None
+    end = int(end.replace(",", "")) if end else None
+    if (start is not None and start < 0) or (end is not None and end <= (start or 0)):
+        raise ValueError(f"Invalid coordinates in region '{region}'.")
+    return (chrom, start, end)
+
+def find_index(path):
+    """Return the path of the index for path: A tabix index (.tbi, .csi) or a local index (.pki), or None if there is none."""
+    import os
+    for suffix in (".tbi", ".csi", PKI_SUFFIX):
+        if os.path.exists(f"{path}{suffix}"):
+            return f"{path}{suffix}"
+    return None
+
+
+
+#
+# -%  Local coordinate index  %-
+
+def build_index(path, seq=0, start=1, end=2, zero_based=True, meta="#", skip=0, delimiter="\t", threads=1):
+    """Index the bgzipped table path, which must be sorted by contig and start. Writes path.gzi and path.pki.
+    seq, start, end: Column numbers (0-based) of the contig, start and end; the defaults are BED's. With end=None, a line
+    covers one base. zero_based: Whether start is 0-based like in BED files (False for VCF, GFF and most summary statistics).
+    meta, skip: Lines starting with meta and the first skip lines are header lines. Returns the index as a dict."""
+    import json
+    from .bgzf import BGZFReader, build_gzi
+    build_gzi(path)
+    index = {"format": "pki1", "columns": [seq, start, end], "zero_based": zero_based, "meta": meta, "skip": skip,
+             "delimiter": delimiter, "window": WINDOW, "contigs": {}}
+    (offset, previous, seen) = (0, None, set())
+    with open(path, "rb") as f, io.BufferedReader(BGZFReader(f, threads=threads)) as stream:
+        for (n, line) in enumerate(stream):
+            (here, offset) = (offset, offset + len(line))
+            line = line.decode()
+            if n < skip or (meta and line.startswith(meta)):
+                if previous is None:
+                    index["header"] = offset
+                continue
+            (chrom, beg, stop) = _coordinates(line, index)
+            if chrom != (previous or (None,))[0]:
+                if chrom in seen:
+                    raise ValueError(f"'{path}' is not sorted: Contig '{chrom}' appears in more than one place.")
+                seen.add(chrom)
+            elif beg < previous[1]:
+                raise ValueError(f"'{path}' is not sorted: Line {n + 1} starts before the line above it.")
+            linear = index["contigs"].setdefault(chrom, [])
+            for window in range(beg >> WINDOW, ((max(stop, beg + 1) - 1) >> WINDOW) + 1):
+                linear.extend([None] * (window + 1 - len(linear)))
+                if linear[window] is None:
+                    linear[window] = here
+            previous = (chrom, beg)
+    for linear in index["contigs"].values():
+        first = next(value for value in linear if value is not None)
+        for (window, value) in enumerate(linear):
+            linear[window] = first = first if value is None else value # Empty windows start at the window before them
+    with open(f"{path}{PKI_SUFFIX}", "w") as out:
+        json.dump(index, out)
+    logger.info(f"region: Indexed {len(index['contigs'])} contigs in '{path}'.")
+    return index
+
+def read_index(path):
+    """Read a local index from path (the .pki file)."""
+    import json
+    with open(path) as f:
+        index = json.load(f)
+    assert index.get("format") == "pki1", f"'{path}' is not a pkclick region index."
+    return index
+
+def _coordinates(line, index):
+    """Return (contig, start, end) of a line as 0-based half-open coordinates."""
+    (seq, start, end) = index["columns"]
+    fields = line.rstrip("\r\n").split(index["delimiter"])
+    beg = int(fields[start]) - (not index["zero_based"])
+    return (fields[seq], beg, int(fields[end]) if end is not None else beg + 1)
+
+
+
+#
+# -%  Region queries  %-
+
+def fetch(path, region, index=None, threads=1):
+    """Yield the header lines of the bgzipped table path, then the lines overlapping region (a string or (chrom, start, end)).
+    index: Path to the index (default: find_index). Lines are returned as str with their line endings.
+    Raises ValueError for a bad region and FileNotFoundError if there is no index, before anything is read."""
+    (chrom, start, end) = parse_region(region) if isinstance(region, str) else region
+    index = index or find_index(path)
+    if index is None:
+        raise FileNotFoundError(f"No index found for '{path}'. Use region.build_index or 'tabix' to create one.")
+    if index.endswith(PKI_SUFFIX):
+        return _fetch_local(path, read_index(index), chrom, start, end, threads)
+    return _fetch_tabix(path, index, chrom, start, end)
+
+def _fetch_local(path, index, chrom, start, end, threads):
+    from .bgzf import open_at, read_gzi
+    block_index = read_gzi(f"{path}.gzi")
+    with open(path, "rb") as f:
+        if index.get("header"):
+            with open_at(f, block_index, 0) as stream:
+                yield from io.TextIOWrapper(io.BytesIO(stream.read(index["header"])), newline="")
+        linear = index["contigs"].get(chrom)
+        if not linear:
+            return
+        with open_at(f, block_index, linear[min((start or 0) >> WINDOW, len(linear) - 1)], threads=threads) as stream:
+            for line in io.TextIOWrapper(stream, newline=""):
+                if not line.strip() or (index["meta"] and line.startswith(index["meta"])):
+                    continue
+                (contig, beg, stop) = _coordinates(line, index)
+                if contig != chrom or (end is not None and beg >= end):
+                    return
+                if start is None or max(stop, beg + 1) > start:
+                    yield line
+
+def _fetch_tabix(path, index, chrom, start, end):
+    import pysam
+    with pysam.TabixFile(path, index=index) as tbx:
+        for line in tbx.header:
+            yield f"{line}\n"
+        if chrom not in tbx.contigs:
+            return
+        for line in tbx.fetch(chrom, start, end):
+            yield f"{line}\n"
+
+def open_region(path, region, index=None, threads=1):
+    """Open the bgzipped table path restricted to region, as a (non-seekable) text stream. See fetch."""
+    return RegionReader(fetch(path, region, index=index, threads=threads), name=f"{path}:{region if isinstance(region, str) else ''}")
+
+
+
+#
+# -%  CLASS: RegionReader  %-
+
+class RegionReader(io.TextIOBase):
+    """A read-only, non-seekable text stream over an iterator of lines."""
+    def __init__(self, lines, name=None):
+        super().__init__()
+        self._lines = iter(lines)
+        self._buffer = ""
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def readline(self, size=-1):
+        (line, self._buffer) = (self._buffer or next(self._lines, ""), "")
+        if size is not None and 0 <= size < len(line):
+            (line, self._buffer) = (line[:size], line[size:])
+        return line
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            (out, self._buffer) = (self._buffer + "".join(self._lines), "")
+            return out
+        out = []
+        while size > 0 and (line := self.readline(size)):
+            out.append(line)
+            size -= len(line)
+        return "".join(out)
+
+    def close(self):
+        if not self.closed:
+            getattr(self._lines, "close", lambda: None)()
+        super().close()
+
@@ -0,0 +1,144 @@
+###########################################################
+#
+# ---%%%  Region-parallel passes over indexed VCF/BCF files  %%%---
+#
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Usage: Split an indexed VCF into regions of about equal size, run a function on the records of each region in a pool of
+# processes, and combine the results in genome order, eg:
+#   def count(records): return sum(1 for _ in records)      # Module level, so the workers can unpickle it
+#   n = map_regions("calls.vcf.gz", count, reduce=operator.add)
+# Each worker opens its own pysam handle. A record belongs to the region holding its start, so records overlapping a
+# boundary (eg. long deletions) are seen exactly once. Regions are balanced on the compressed bytes in the tabix linear
+# index (.tbi); for CSI indexes and BCF files they are balanced on the contig lengths in the header.
+
+WINDOW = 14 # log2 of the window size in tabix' linear index
+
+def split(vcf, n=None):
+    """Split the contigs of the indexed VCF/BCF vcf (a path or a pysam.VariantFile) into about n regions of equal work
+    (default: 4 per CPU). Returns a list of (contig, start, end) in file order; 0-based half-open, end None for the contig's end.
+    Only contigs in the index (those with records) are included."""
+    import os
+    import numpy as np
+    import pysam
+    path = _path(vcf)
+    n = n or 4 * os.cpu_count()
+    with pysam.VariantFile(path) as handle:
+        if handle.index is None:
+            raise FileNotFoundError(f"No index found for '{path}'. Use 'bcftools index' or 'tabix -p vcf' to create one.")
+        contigs = list(handle.index)
+        lengths = {contig: handle.header.contigs[contig].length if contig in handle.header.contigs else None for contig in contigs}
+    work = _tabix_work(path, contigs) if os.path.exists(f"{path}.tbi") else None
+    if work is None:
+        work = {contig: (np.array([0, length or 1]), np.array([0, length or 1])) for (contig, length) in lengths.items()}
+    total = sum(float(ys[-1]) for (xs, ys) in work.values())
+    target = total / n if total else 1.0
+    regions = []
+    for contig in contigs:
+        (xs, ys) = work[contig]
+        pieces = max(1, round(float(ys[-1]) / target))
+        cuts = sorted({int(np.interp(ys[-1] * j / pieces, ys, xs)) for j in range(1, pieces)} - {0})
+        if lengths[contig]:
+            cuts = [cut for cut in cuts if cut < lengths[contig]]
+        bounds = [0] + cuts + [lengths[contig]]
+        regions.extend((contig, start, end) for (start, end) in zip(bounds, bounds[1:]))
+    logger.debug(f"vcfregions: Split '{path}' into {len(regions)} regions.")
+    return regions
+
+def records(vcf, region):
+    """Yield the records of the pysam.VariantFile vcf which start in region (contig, start, end)."""
+    (contig, start, end) = region
+    for record in vcf.fetch(contig, start, end):
+        if record.start >= start:
+            yield record
+
+def map_regions(vcf, func, regions=None, n_jobs=None, reduce=None, initial=None, samples=None, **kwargs):
+    """Call func(records, **kwargs) on the records of each region, in a pool of n_jobs processes (default: all CPUs).
+    func must be picklable, ie. defined at module level. regions: As from split (default: split(vcf, 4 * n_jobs)).
+    samples: Restrict the records to these samples. Returns the results as a list in region order, or, with reduce,
+    functools.reduce(reduce, results[, initial]), which is run in this process as the results come in, in order."""
+    import os
+    path = _path(vcf)
+    n_jobs = n_jobs or os.cpu_count()
+    regions = split(path, 4 * n_jobs) if regions is None else regions
+    logger.info(f"vcfregions: Running {getattr(func, '__name__', func)} on {len(regions)} regions of '{path}' using {n_jobs} processes.")
+    if n_jobs == 1:
+        results = (_run(path, region, func, samples, kwargs) for region in regions)
+        return _reduce(results, reduce, initial)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        jobs = [pool.submit(_run, path, region, func, samples, kwargs) for region in regions]
+        return _reduce((job.result() for job in jobs), reduce, initial)
+
+
+
+#
+# -%  Helper functions  %-
+
+def _path(vcf):
+    """The path of vcf: A path, or a pysam.VariantFile (eg. from VCFFile, also with metrics on)."""
+    import os
+    return os.fsdecode(vcf if isinstance(vcf, (str, bytes, os.PathLike)) else vcf.filename)
+
+def _run(path, region, func, samples, kwargs):
+    """Worker: Open path and call func on the records of region."""
+    import pysam
+    with pysam.VariantFile(path) as vcf:
+        if samples is not None:
+            vcf.subset_samples(samples)
+        return func(records(vcf, region), **kwargs)
+
+def _reduce(results, reduce, initial):
+    import functools
+    if reduce is None:
+        return list(results)
+    return functools.reduce(reduce, results) if initial is None else functools.reduce(reduce, results, initial)
+
+def _tabix_work(path, contigs):
+    """Return {contig: (xs, ys)}, where ys[i] is the number of compressed bytes from the contig's first record to position
+    xs[i], read from the linear index of path.tbi. None if the index can't be read."""
+    import gzip
+    import os
+    import struct
+    import numpy as np
+    try:
+        with gzip.open(f"{path}.tbi", "rb") as f:
+            data = f.read()
+        if data[:4] != b"TBI\x01":
+            return None
+        (n_ref,) = struct.unpack_from("<i", data, 4)
+        (l_nm,) = struct.unpack_from("<i", data, 32)
+        names = [name.decode() for name in data[36:36 + l_nm].split(b"\0")[:n_ref]]
+        pos = 36 + l_nm
+        offsets = {}
+        for name in names:
+            (n_bin,) = struct.unpack_from("<i", data, pos)
+            pos += 4
+            for _ in range(n_bin):
+                (n_chunk,) = struct.unpack_from("<i", data, pos + 4) # bin, n_chunk, then (begin, end) virtual offsets
+                pos += 8 + 16 * n_chunk
+            (n_intv,) = struct.unpack_from("<i", data, pos)
+            ioff = np.frombuffer(data, dtype="<u8", count=n_intv, offset=pos + 4) >> np.uint64(16) # Virtual to compressed offsets
+            pos += 4 + 8 * n_intv
+            if n_intv:
+                offsets[name] = np.maximum.accumulate(ioff).astype(np.int64)
+    except (OSError, struct.error, ValueError, EOFError) as e:
+        logger.debug(f"vcfregions: Could not read the linear index of '{path}.tbi': {e}")
+        return None
+    if not set(contigs) <= set(offsets):
+        return None
+    # A contig ends where the next one (in file order) begins
+    starts = sorted(int(ioff[0]) for ioff in offsets.values())
+    size = os.path.getsize(path)
+    work = {}
+    for contig in contigs:
+        ioff = offsets[contig]
+        stop = next((start for start in starts if start > ioff[0]), size)
+        ys = np.append(ioff, max(stop, int(ioff[-1]))) - ioff[0]
+        xs = np.arange(len(ys), dtype=np.int64) << WINDOW
+        work[contig] = (xs, ys)
+    return work
+
@@ -3,5 +3,6 @@
 from csv import *
 
 # Then import the functions from pkcsv that we want to replace those in csv
-from .pkcsv import reader, DictReader, sniff
+from .pkcsv import reader, DictReader, Row, sniff, infer_schema, NA_VALUES
+from .parallel import ParallelReader
 
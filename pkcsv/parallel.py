@@ -0,0 +1,113 @@
+
+#
+# --%%  parallel.py    %%--
+#
+
+__version__ = "1.0"
+
+import csv
+import itertools
+import logging
+
+from .pkcsv import NA_VALUES, _configure, _batches, _convert, _first_line, _line_boundary, _decode_lines
+
+logger = logging.getLogger(__name__)
+
+_DIALECT_ATTRIBUTES = ("delimiter", "quotechar", "escapechar", "doublequote", "skipinitialspace", "quoting", "lineterminator", "strict")
+
+
+class ParallelReader(object):
+    """Parse a large uncompressed table in a pool of processes.
+
+    The file is sniffed once with the same rules as pkcsv.reader, then memory mapped and split into byte ranges
+    aligned to line boundaries. Workers parse the ranges with the sniffed dialect and return them as column blocks
+    like read_batches does. Fields with quoted line breaks are not supported, since ranges are split on lines.
+    Comment lines are skipped everywhere, not just at the top of the file.
+    """
+    def __init__(self, path, n_jobs=None, chunk_bytes=1 << 26, ordered=True, comment_char=None, dialect=None, delimiter=None,
+                 header=True, usecols=None, dtypes=None, na_values=NA_VALUES, encoding="utf-8"):
+        """path: An uncompressed file. header: whether the first non-comment line holds the column names.
+        ordered: yield blocks in file order (otherwise as soon as they are parsed).
+        usecols, dtypes and na_values work like in pkcsv.reader.read_batches."""
+        import mmap
+        import os
+        (self.path, self.n_jobs, self.ordered, self.na_values) = (path, n_jobs or os.cpu_count(), ordered, na_values)
+        with open(path, newline="", encoding=encoding) as f:
+            (_, dialect, self._sample) = _configure(f, comment_char=comment_char, dialect=dialect, delimiter=delimiter, sample_size=100)
+        self.dialect = {attribute: getattr(dialect, attribute) for attribute in _DIALECT_ATTRIBUTES if hasattr(dialect, attribute)}
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = _first_line(mm, comment_char, encoding)
+            self.names = None
+            if header:
+                end = _line_boundary(mm, offset)
+                self.names = next(csv.reader(_decode_lines(mm, offset, end, encoding), **self.dialect))
+                offset = end
+            bounds = [offset]
+            while bounds[-1] < len(mm):
+                bounds.append(_line_boundary(mm, bounds[-1] + chunk_bytes))
+        self.ranges = list(zip(bounds[:-1], bounds[1:]))
+        self.categories = {}
+        self._types = self._resolve(dtypes, header)
+        self._job = (comment_char, encoding, usecols)
+        logger.info(f"ParallelReader: Reading '{path}' in {len(self.ranges)} ranges using {self.n_jobs} processes.")
+
+    def __iter__(self):
+        """Yield one block per byte range; a dict of numpy arrays keyed by column name (or number without header)."""
+        from collections import deque
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        ranges = iter(self.ranges)
+        # Parse categories in the main process, so the codes are the same in every block
+        types = None if self._types is None else {key: "str" if kind == "category" else kind for (key, kind) in self._types.items()}
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+            submit = lambda bounds: pool.submit(_parse_range, self.path, bounds, self.dialect, self.names, types, self.na_values, self._inferred, *self._job)
+            pending = deque(submit(bounds) for (_, bounds) in zip(range(2 * self.n_jobs), ranges)) # Bounded read-ahead
+            while pending:
+                if self.ordered:
+                    done = [pending.popleft()]
+                else:
+                    done = wait(pending, return_when=FIRST_COMPLETED).done
+                    pending = deque(job for job in pending if job not in done)
+                for job in done:
+                    (block, widened) = job.result()
+                    if widened:
+                        types.update(widened) # Ranges submitted from now on are parsed with the widened types
+                    pending.extend(submit(bounds) for bounds in itertools.islice(ranges, 1))
+                    yield self._categorize(block)
+
+    def _categorize(self, block):
+        """Convert category columns to codes shared by all blocks."""
+        for (key, kind) in (self._types or {}).items():
+            if kind == "category" and key in block:
+                block[key] = _convert(block[key], kind, self.na_values, self.categories.setdefault(key, []))
+        return block
+
+    def _resolve(self, dtypes, header):
+        """Resolve dtypes into a dict of column types, inferring the schema from the sniffed sample if needed.
+        The columns whose types were inferred are kept in self._inferred; like in read_batches, they are widened if they don't fit."""
+        from .pkcsv import infer_schema
+        self._inferred = set()
+        if dtypes is None:
+            return None
+        rows = self._sample[1:] if header else self._sample
+        types = dict(zip(self.names if header else range(len(rows[0])), infer_schema(rows, self.na_values, names=self.names if header else None)))
+        if dtypes != "infer":
+            types.update(dtypes)
+        self._inferred = set(types) - set(dtypes if dtypes != "infer" else ())
+        return types
+
+
+
+def _parse_range(path, bounds, dialect, names, types, na_values, inferred, comment_char, encoding, usecols):
+    """Worker: parse the lines in one byte range of the file into a column block.
+    Returns (block, widened), where widened holds the inferred columns whose types had to be widened, and their new types."""
+    import mmap
+    (start, end) = bounds
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = _decode_lines(mm, start, end, encoding)
+    if comment_char:
+        lines = [line for line in lines if not line.startswith(comment_char)]
+    rows = csv.reader(lines, **dialect)
+    widened = None if types is None else dict(types)
+    block = next(_batches(rows, len(lines) or 1, names, usecols, widened, na_values, {}, inferred), {})
+    return (block, {key: kind for (key, kind) in (widened or {}).items() if kind != types[key]})
+
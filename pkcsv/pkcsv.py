@@ -3,24 +3,38 @@
 # --%%  pkcsv.py    %%--
 #
 
-__version__ = "1.4.0"
+__version__ = "1.10.0"
 # 1.2 : Changed reader into a real classed object.
 # 1.3 : Added a try statement to catch errors in DictReader if f isn't correct format.
 # 1.4 : Made _configure and the sniffer part more robust with try, except clause
+# 1.5 : Added read_batches for reading blocks of rows as column arrays
+# 1.6 : Schema inference from a sample of rows and typed columns in read_batches
+# 1.7 : Seekable input is peeked and rewound instead of tee'd; optional memory mapped reading
+# 1.8 : Added ParallelReader (in parallel.py) for parsing big uncompressed files in a process pool
+# 1.9 : Column projection (usecols) and compact Row objects in DictReader
+# 1.10: Chromosome columns are never inferred as numbers, and inferred types are widened instead of failing on later rows
 
 import csv
 import itertools
 import logging
+from collections.abc import Mapping
 
 logger = logging.getLogger(__name__)
 
+NA_VALUES = ("", ".", "NA", "N/A", "NaN", "nan", "NULL", "null")
+CHROM_COLUMNS = ("chr", "chrom", "chromosome", "chr_name", "hm_chr", "seqname", "seqnames", "contig") # Never inferred as numbers
+
 class reader(object):
     """Extend 'reader' from csv to add extra functionality."""
-    def __init__(self, f, dialect=None, comment_char=None, delimiter=None, *args, **kwargs):
-        """Autodetects input with sniffer and returns tuple with iter and header."""
+    def __init__(self, f, dialect=None, comment_char=None, delimiter=None, *args, na_values=NA_VALUES, sample_size=100, memory_map=False, **kwargs):
+        """Autodetects input with sniffer and returns tuple with iter and header.
+        The first sample_size lines are kept for schema inference; na_values are the tokens read as missing in typed columns.
+        memory_map reads plain uncompressed files straight out of a memory map."""
         logger.debug(f"csv.reader reading from: {f}")
-        (fout, dialect) = _configure(f, comment_char=comment_char, dialect=dialect, delimiter=delimiter)
+        (fout, dialect, self._sample) = _configure(f, comment_char=comment_char, dialect=dialect, delimiter=delimiter, sample_size=sample_size, memory_map=memory_map)
         self._reader = csv.reader(fout, dialect=dialect, *args, **kwargs)
+        self.na_values = na_values
+        self.categories = {}
 
     def __iter__(self):
         return self
@@ -28,31 +42,126 @@ class reader(object):
     def __next__(self):
         return next(self._reader)
 
+    def schema(self, header=False):
+        """Column types inferred from the sample; keyed by column name if the first line is a header, else by number."""
+        rows = self._sample[1:] if header else self._sample
+        types = infer_schema(rows, self.na_values, names=self._sample[0] if header else None)
+        return dict(zip(self._sample[0], types)) if header else dict(enumerate(types))
+
+    def read_batches(self, n, usecols=None, header=False, dtypes=None):
+        """Generator returning blocks of up to n rows as columns.
+
+        Each block is a dict of numpy arrays keyed by column number, or by column name if header is True,
+        in which case the next row is read as the header. usecols limits the output to these columns (numbers or names).
+        dtypes: None returns strings; 'infer' converts columns to the types found by schema(); a dict maps columns to
+        types ('int', 'float', 'category', 'str' or a numpy dtype), with any columns left out taken from schema().
+        Category columns are returned as int32 codes (-1 for missing) into self.categories[column].
+        """
+        names = next(self._reader) if header else None
+        (types, inferred) = _types(dtypes, lambda: self.schema(header=header))
+        yield from _batches(self._reader, n, names, usecols, types, self.na_values, self.categories, inferred)
+
     @property
     def QUOTE_ALL(self):
         return True
 
 class DictReader(csv.DictReader):
     """Extend DictReader from csv to add extra functionality."""
-    def __init__(self, f, fieldnames=None, dialect=None, comment_char=None, delimiter=None, *args, **kwargs):
-        """Autodetects input with sniffer and returns dict with header as keys. Lines starting with comment_char will be skipped."""
+    def __init__(self, f, fieldnames=None, dialect=None, comment_char=None, delimiter=None, *args, na_values=NA_VALUES, sample_size=100, memory_map=False, usecols=None, compact=False, **kwargs):
+        """Autodetects input with sniffer and returns dict with header as keys. Lines starting with comment_char will be skipped.
+        The first sample_size lines are kept for schema inference; na_values are the tokens read as missing in typed columns.
+        memory_map reads plain uncompressed files straight out of a memory map.
+        usecols limits the rows to these columns. compact returns Row objects, which share one field map, instead of dicts."""
         logger.debug(f"csv.DictReader reading from: {f}")
-        (fout, dialect) = _configure(f, comment_char=comment_char, dialect=dialect, delimiter=delimiter)
+        (fout, dialect, self._sample) = _configure(f, comment_char=comment_char, dialect=dialect, delimiter=delimiter, sample_size=sample_size, memory_map=memory_map)
         header = next(csv.reader([next(fout)], dialect=dialect)) # Extracts header and discards it from fout)
         logger.debug(f"DictReader reading columns: {header}")
         super().__init__(fout, fieldnames=header, dialect=dialect, *args, **kwargs)
+        self.na_values = na_values
+        self.categories = {}
+        self.usecols = usecols
+        self._project(usecols, compact)
 
-def _configure(f, dialect=None, comment_char=None, delimiter=None):
-    """Check input and find header and readable iterator."""
-    (f1, f2) = itertools.tee(f,2)
-    if comment_char:
-        while ((line1 := next(f1)).startswith(comment_char)):
-            next(f2) # Discards all lines starting with comment_char from beginning of file.
-        while ((line2 := next(f1)).startswith(comment_char)):
-            pass
+    def __next__(self):
+        if self._getter is None:
+            return super().__next__()
+        row = next(self.reader)
+        while row == []:
+            row = next(self.reader)
+        self.line_num = self.reader.line_num
+        if len(row) < self._width:
+            row = row + [self.restval] * (self._width - len(row))
+        return self._make(self._getter(row))
+
+    def _project(self, usecols, compact):
+        """Set up the getter and row constructor used by __next__ for usecols and compact."""
+        from operator import itemgetter
+        if usecols is None and not compact:
+            self._getter = None
+            return
+        names = self.fieldnames if usecols is None else list(usecols)
+        missing = [name for name in names if name not in self.fieldnames]
+        if missing:
+            raise ValueError(f"PKCSV: Columns {missing} not found in header {self.fieldnames}")
+        idx = [self.fieldnames.index(name) for name in names]
+        self._width = max(idx, default=-1) + 1
+        self._getter = (lambda row: (row[idx[0]],)) if len(idx) == 1 else itemgetter(*idx)
+        if compact:
+            row_type = type("Row", (Row,), {"__slots__": (), "_index": {name: i for (i, name) in enumerate(names)}})
+            self._make = row_type
+        else:
+            self._make = lambda values: dict(zip(names, values))
+
+    def schema(self):
+        """Column types inferred from the sample, keyed by column name."""
+        return dict(zip(self.fieldnames, infer_schema(self._sample[1:], self.na_values, names=self.fieldnames)))
+
+    def read_batches(self, n, usecols=None, dtypes=None):
+        """Generator returning blocks of up to n rows as a dict of numpy arrays keyed by column name.
+        usecols limits the output to these columns. dtypes works like in reader.read_batches."""
+        (types, inferred) = _types(dtypes, self.schema)
+        usecols = self.usecols if usecols is None else usecols
+        yield from _batches(self.reader, n, self.fieldnames, usecols, types, self.na_values, self.categories, inferred)
+
+class Row(Mapping):
+    """A compact, read-only row from DictReader(compact=True). Works like a dict, but only holds a tuple of values;
+    the field names are shared by all rows from the same reader."""
+    __slots__ = ("_values",)
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"Row({dict(self)})"
+
+    def values(self):
+        return self._values
+
+def _configure(f, dialect=None, comment_char=None, delimiter=None, sample_size=2, memory_map=False):
+    """Check input and find header and readable iterator.
+    Returns (iterator, dialect, sample), where sample holds the first sample_size (at least 2) lines parsed into rows.
+    Seekable files are peeked with readline and rewound, so the file itself is returned and read without a tee buffer.
+    With memory_map, plain uncompressed files are instead read as lines straight out of a memory map."""
+    origin = _tell(f)
+    if origin is not None:
+        (fout, lines) = (f, _seek_lines(f, comment_char, max(sample_size, 2)))
+        if memory_map and origin == 0:
+            fout = _map_lines(f, comment_char) or f
     else:
-        line1 = next(f1)
-        line2 = next(f1)
+        (fout, lines) = _tee_lines(f, comment_char, max(sample_size, 2))
+    if len(lines) < 2:
+        raise csv.Error("PKCSV: Input must have a header and at least one line of data.")
+    (line1, line2) = lines[:2]
     logger.debug(f"Sniffer evaluating line1: {line1.rstrip()}")
     logger.debug(f"Sniffer evaluating line2: {line2.rstrip()}")
     if dialect is None:
@@ -62,15 +171,186 @@ def _configure(f, dialect=None, comment_char=None, delimiter=None):
             logger.error(f"PKCSV: _configure unable to determine delimiter. Input treated as single column (Not yet implemented).")
             exit("Exited due to unimplemented feature.")
         logger.debug(f"PKCSV: Dialect = {dialect}; Delimiter = {delimiter}")
-    reader = csv.reader([line1, line2], dialect)
-    header = next(reader)
-    second = next(reader)
+    sample = list(csv.reader(lines, dialect))
+    (header, second) = sample[:2]
     logger.debug(f"Parsing input header: {header}")
     logger.debug(f"Parsing input first row: {second}")
     if len(header) + 1 == len(second):
         logger.info(f"R table format detected in input.")
         header = ["row.index"] + header
-    return f2, dialect
+    return fout, dialect, sample
+
+def _tell(f):
+    """Return the position of f if it is a seekable file which can be rewound after readline, otherwise None."""
+    try:
+        return f.tell() if f.seekable() else None
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def _seek_lines(f, comment_char, n):
+    """Read the first n non-comment lines of a seekable file and seek back to the first of them."""
+    (start, lines) = (f.tell(), [])
+    while len(lines) < n and (line := f.readline()):
+        if comment_char and line.startswith(comment_char):
+            if not lines:
+                start = f.tell() # Discards all lines starting with comment_char from beginning of file.
+            continue
+        lines.append(line)
+    f.seek(start)
+    return lines
+
+def _tee_lines(f, comment_char, n):
+    """Peek at the first n non-comment lines of any iterable through a tee. Returns (iterator, lines)."""
+    (f1, f2) = itertools.tee(f, 2)
+    lines = []
+    for line in f1:
+        if comment_char and line.startswith(comment_char):
+            if not lines:
+                next(f2) # Discards all lines starting with comment_char from beginning of file.
+            continue
+        lines.append(line)
+        if len(lines) == n:
+            break
+    return (f2, lines)
+
+def _map_lines(f, comment_char, chunk_size=1 << 22):
+    """Iterate over the lines of a plain uncompressed file straight out of a memory map, skipping leading comment lines.
+    Lines are decoded and split a few MB at a time, and returned without line endings. Returns None if f isn't a plain file."""
+    import io
+    import mmap
+    buffer = getattr(f, "buffer", None)
+    if not (isinstance(buffer, io.BufferedReader) and isinstance(buffer.raw, io.FileIO)):
+        return None
+    try: mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    (encoding, errors) = (f.encoding, f.errors)
+    offset = _first_line(mm, comment_char, encoding)
+    logger.debug(f"PKCSV: Memory mapped '{f.name}' from byte {offset}.")
+    def chunks(offset):
+        while offset < len(mm):
+            end = _line_boundary(mm, offset + chunk_size)
+            yield _decode_lines(mm, offset, end, encoding, errors)
+            offset = end
+    return itertools.chain.from_iterable(chunks(offset))
+
+def _first_line(mm, comment_char, encoding):
+    """Byte offset of the first line in a memory map (or bytes) not starting with comment_char."""
+    offset = 0
+    if comment_char:
+        comment = comment_char.encode(encoding)
+        while mm[offset:offset + len(comment)] == comment and (offset := mm.find(b"\n", offset) + 1) > 0:
+            pass
+    return offset
+
+def _line_boundary(mm, offset):
+    """Byte offset of the start of the first line at or after offset (or the end of mm)."""
+    if offset >= len(mm):
+        return len(mm)
+    end = mm.find(b"\n", offset)
+    return len(mm) if end == -1 else end + 1
+
+def _decode_lines(mm, start, end, encoding, errors=None):
+    """Decode the whole lines in mm[start:end] and split them, without line endings."""
+    lines = str(mm[start:end], encoding, errors or "strict").split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+def infer_schema(rows, na_values=NA_VALUES, names=None):
+    """Infer the type of each column from a sample of rows (lists of strings).
+    Returns a list with 'int', 'float', 'category' or 'str' per column. Columns repeating few distinct
+    values are 'category'; columns with nothing but NA tokens are 'str'. With names (the header), chromosome
+    columns (see CHROM_COLUMNS) are 'category', as a sorted file has its numbered chromosomes (1-22) before X and Y."""
+    import numpy as np
+    types = []
+    names = list(names or ())
+    for (i, column) in enumerate(itertools.zip_longest(*rows, fillvalue="")):
+        values = [value for value in column if value not in na_values]
+        if i < len(names) and names[i].lstrip("#").lower() in CHROM_COLUMNS:
+            types.append("category")
+            continue
+        if not values:
+            types.append("str")
+            continue
+        values = np.array(values, dtype=str)
+        for kind in ("int", "float"):
+            try:
+                values.astype(np.int64 if kind == "int" else np.float64)
+                types.append(kind)
+                break
+            except (ValueError, OverflowError):
+                pass
+        else:
+            types.append("category" if len(values) > 1 and len(set(values.tolist())) <= len(values) // 2 else "str")
+    logger.debug(f"PKCSV: Inferred schema = {types}")
+    return types
+
+def _types(dtypes, schema):
+    """Resolve the dtypes argument of read_batches into (types, inferred): A dict of column types (or None for plain strings),
+    and the set of columns whose types were inferred rather than given."""
+    if dtypes is None:
+        return (None, set())
+    types = schema()
+    if dtypes != "infer":
+        types.update(dtypes)
+    return (types, set(types) - set(dtypes if dtypes != "infer" else ()))
+
+def _convert(column, kind, na_values, categories):
+    """Convert a numpy string column to kind in bulk. categories is the growing list of labels for a category column."""
+    import numpy as np
+    if kind == "str" or kind is str:
+        return column
+    na = np.isin(column, na_values)
+    if kind == "category":
+        (labels, inverse) = np.unique(column, return_inverse=True)
+        index = {label: i for (i, label) in enumerate(categories)}
+        codes = np.array([index.get(label, -1) if label not in na_values else -1 for label in labels.tolist()], dtype=np.int32)
+        for (i, label) in enumerate(labels.tolist()):
+            if codes[i] == -1 and label not in na_values:
+                (codes[i], index[label]) = (len(categories), len(categories))
+                categories.append(label)
+        return codes[inverse.reshape(-1)]
+    dtype = np.dtype({"int": np.int64, "float": np.float64}.get(kind, kind))
+    if dtype.kind == "f" or (dtype.kind in "iu" and na.any()):
+        values = np.where(na, "nan", column).astype(np.float64) # Integers with missing values become floats
+        return values if dtype.kind in "iu" else values.astype(dtype, copy=False)
+    return column.astype(dtype)
+
+def _batches(rows, n, names=None, usecols=None, types=None, na_values=NA_VALUES, categories=None, inferred=()):
+    """Read blocks of n rows and transpose them into columns, keyed by names if given, and convert them to types.
+    A column in inferred whose values don't fit its type (eg. an 'int' column which turns out to hold 'X' further down)
+    is widened to float or str, with a warning, instead of raising ValueError."""
+    import numpy as np
+    from operator import itemgetter
+    idx = None if usecols is None else [names.index(col) if isinstance(col, str) else col for col in usecols]
+    while (block := list(itertools.islice(rows, n))):
+        if idx is None:
+            width = len(names) if names is not None else len(block[0])
+            columns = list(itertools.zip_longest(*block, fillvalue=""))[:width]
+            keys = range(width)
+        elif len(idx) == 1:
+            (columns, keys) = ([list(map(itemgetter(idx[0]), block))], idx)
+        else:
+            (columns, keys) = (list(zip(*map(itemgetter(*idx), block))), idx)
+        block = {(names[i] if names is not None else i): np.array(column, dtype=str) for (i, column) in zip(keys, columns)}
+        for (key, column) in (block.items() if types else ()):
+            kind = types.get(key, "str")
+            try: block[key] = _convert(column, kind, na_values, categories.setdefault(key, []) if kind == "category" else None)
+            except ValueError as e:
+                if key not in inferred:
+                    raise ValueError(f"PKCSV: Unable to convert column '{key}' to {kind}: {e}") from e
+                (types[key], block[key]) = _widen(column, kind, na_values)
+                logger.warning(f"PKCSV: Column '{key}' was inferred as {kind} from the first rows, but holds other values further down. "
+                               f"It is read as {types[key]} from here on; set its type with dtypes to avoid this.")
+        yield block
+
+def _widen(column, kind, na_values):
+    """Return (kind, values) for a column which didn't fit its inferred kind: float if it was int and can be, otherwise str."""
+    if kind == "int":
+        try: return ("float", _convert(column, "float", na_values, None))
+        except ValueError: pass
+    return ("str", column)
 
 def sniff(f, comment_char=None, delimiters=None):
     if not f.seekable():
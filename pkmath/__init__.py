@@ -1,5 +1,6 @@
 
 # Then import the functions from pkmath that we want
-from .pkmath import rank_int, scaler_absolute_maximum, scaler_min_max, scaler_z_scores
-
+from .pkmath import rank_int, rank_int_frame, scaler_absolute_maximum, scaler_min_max, scaler_z_scores
+from .streaming import AbsoluteMaximumScaler, MinMaxScaler, ZScoreScaler, iter_chunks
+from .parallel import parallel_columns
 
@@ -0,0 +1,90 @@
+
+#
+# --%%  parallel.py    %%--
+#
+
+__version__ = "1.0"
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+#
+# -%  MATH: Apply column transforms in a process pool  %-
+
+def parallel_columns(frame, func, n_jobs=None, per_column=False, block_size=None, **kwargs):
+    """Apply a column-wise transform to a DataFrame or 2-D ndarray using a pool of processes.
+
+    The values are copied once into shared memory; each worker reads its block of columns from there and writes
+    its result back, so the frame itself is never pickled. Columns come back in their original order.
+    func must be a module-level function (eg. rank_int_frame or one of the scalers), which is called on a DataFrame
+    block with **kwargs, or on one Series at a time if per_column is True (eg. for rank_int).
+    Every block gets the same kwargs, so a seed for rank_int_frame gives each column the same ties as a serial run,
+    no matter how the columns are split.
+    Args:
+        param1 (pandas.DataFrame or numpy.ndarray): Numeric values, one trait per column
+        param2 (function):      The transform
+        param3 (Optional[int]): Number of processes (default: all CPUs)
+        param4 (Optional[bool]): Call func on each column as a Series instead of on a block
+        param5 (Optional[int]): Columns per block (default: spread the columns over 4 blocks per process)
+    Returns:
+        pandas.DataFrame (numpy.ndarray if given one)
+    """
+    import os
+    import numpy as np
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    is_array = isinstance(frame, np.ndarray)
+    values = np.asarray(frame, dtype=np.float64)
+    assert values.ndim == 2, "parallel_columns needs a 2-D input"
+    n_jobs = n_jobs or os.cpu_count()
+    ncols = values.shape[1]
+    block_size = block_size or max(1, -(-ncols // (n_jobs * 4)))
+    blocks = [(lo, min(lo + block_size, ncols)) for lo in range(0, ncols, block_size)]
+    logger.info(f"parallel_columns: Running {func.__name__} on {ncols} columns in {len(blocks)} blocks using {n_jobs} processes.")
+
+    nbytes = max(values.nbytes, 1)
+    shm_in  = shared_memory.SharedMemory(create=True, size=nbytes)
+    shm_out = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        np.ndarray(values.shape, dtype=np.float64, buffer=shm_in.buf, order="F")[:] = values # Column-major, so every block is contiguous
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            jobs = [pool.submit(_run_block, shm_in.name, shm_out.name, values.shape, lo, hi, func, per_column, kwargs) for (lo, hi) in blocks]
+            for job in jobs:
+                job.result() # Raises the worker's exception, if any
+        out = np.ndarray(values.shape, dtype=np.float64, buffer=shm_out.buf, order="F").copy()
+    finally:
+        for shm in (shm_in, shm_out):
+            shm.close()
+            shm.unlink()
+    if is_array:
+        return out
+    return pd.DataFrame(out, index=frame.index, columns=frame.columns)
+
+def _run_block(name_in, name_out, shape, lo, hi, func, per_column, kwargs):
+    """Worker: transform columns lo:hi of the shared input and write them into the shared output."""
+    import numpy as np
+    import pandas as pd
+    shm_in  = _attach(name_in)
+    shm_out = _attach(name_out)
+    try:
+        block = pd.DataFrame(np.ndarray(shape, dtype=np.float64, buffer=shm_in.buf, order="F")[:, lo:hi], columns=range(lo, hi), copy=True)
+        if per_column:
+            result = pd.concat([func(block[column], **kwargs) for column in block.columns], axis=1)
+        else:
+            result = func(block, **kwargs)
+        np.ndarray(shape, dtype=np.float64, buffer=shm_out.buf, order="F")[:, lo:hi] = np.asarray(result, dtype=np.float64)
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+def _attach(name):
+    """Attach to an existing shared memory block. The parent owns the block and unlinks it, so it should not be tracked here.
+    Before Python 3.13 the workers share the parent's resource tracker, where registering the block again is harmless."""
+    from multiprocessing import shared_memory
+    try: return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: return shared_memory.SharedMemory(name=name)
+
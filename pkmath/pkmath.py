@@ -3,7 +3,8 @@
 # --%%  pkmath.py    %%--
 #
 
-__version__ = "1.0"
+__version__ = "1.1"
+# 1.1 : Added rank_int_frame for transforming many columns at once
 
 import logging
 
@@ -79,8 +80,50 @@ def rank_int(series, c=3.0/8, stochastic=True):
         rank = ss.rankdata(series, method="ordinal") # Get rank, ties are determined by their position in the series (hence why we randomised the series)
     else:
         rank = ss.rankdata(series, method="average") # Get rank, ties are averaged
-    rank = pd.Series(rank, index=series.index) # Convert numpy array back to series
-    transformed = rank.apply(rank_to_normal, c=c, n=len(rank)) # Convert rank to normal distribution
-    return transformed[orig_idx]
+    transformed = pd.Series(rank_to_normal(rank, c=c, n=len(rank)), index=series.index) # Convert rank to normal distribution
+    return transformed.reindex(orig_idx)
+
+def rank_int_frame(frame, c=3.0/8, stochastic=True, groups=None, seed=123):
+    """Perform rank-based inverse normal transformation on every column of a DataFrame or 2-D ndarray.
+
+    Like rank_int, but all columns are ranked and transformed in one vectorized pass. NaN values are ignored
+    per column. Ties are broken with one random permutation of the rows drawn from a local generator, so the
+    global numpy RNG is left alone and the result only depends on the seed and the number of rows.
+    Args:
+        param1 (pandas.DataFrame or numpy.ndarray): Values to transform, one trait per column
+        param2 (Optional[float]):      Constant parameter (Bloms constant)
+        param3 (Optional[bool]):       Whether to randomise rank of ties
+        param4 (Optional[array-like]): Group label for each row (eg. cohort); every group is transformed separately
+        param5 (Optional[int or numpy.random.Generator]): Seed or generator used to randomise ties
+    Returns:
+        pandas.DataFrame (numpy.ndarray if given one)
+    """
+    import pandas as pd
+    import numpy as np
+    import scipy.special as sp
+
+    # Check input
+    is_array = isinstance(frame, np.ndarray)
+    df = pd.DataFrame(frame) if is_array else frame
+    assert isinstance(df, pd.DataFrame)
+    assert isinstance(c, float)
+    assert groups is None or len(groups) == len(df), "groups must have one label per row"
+
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    values = df.reset_index(drop=True) # Work on row positions; the original index is put back at the end
+    if stochastic:
+        values = values.iloc[rng.permutation(len(values))] # Shuffle rows, so 'first' ranks ties randomly
+    if groups is None:
+        rank = values.rank(method="first" if stochastic else "average")
+        n = values.count()
+    else:
+        labels = np.asarray(groups)[values.index.to_numpy()]
+        rank = values.groupby(labels).rank(method="first" if stochastic else "average")
+        n = values.notna().groupby(labels).transform("sum")
+    transformed = sp.ndtri((rank - c) / (n - 2*c + 1)).sort_index() # Standard quantile function, then back in row order
+    if is_array:
+        return transformed.to_numpy()
+    transformed.index = df.index
+    return transformed
 
 
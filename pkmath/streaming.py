@@ -0,0 +1,183 @@
+
+#
+# --%%  streaming.py    %%--
+#
+
+__version__ = "1.0"
+
+import itertools
+import logging
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+
+#
+# -%  MATH: Out-of-core versions of the scalers in pkmath  %-
+#
+# Usage: Fit on one pass over the data, then transform on a second pass, eg:
+#   scaler = ZScoreScaler(columns=["BMI"]).fit(iter_chunks(pkcsv.DictReader(f1), columns=["BMI"]))
+#   scaler.write(iter_chunks(pkcsv.DictReader(f2), numeric=["BMI"]), out)
+
+class _StreamScaler(object):
+    """Base class for scalers which learn their statistics one chunk at a time.
+    Chunks can be pandas DataFrames, Series or numpy arrays. Statistics are kept per column and NaNs are ignored."""
+    def __init__(self, columns=None):
+        """columns: Only fit and transform these columns (default: all columns in the first chunk)."""
+        self.columns = columns
+        self._n = None
+
+    def fit(self, chunks):
+        """Fit the statistics in one pass over an iterable of chunks. Returns self."""
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        logger.debug(f"{type(self).__name__}: Fitted on {self.n.to_dict()} values.")
+        return self
+
+    def partial_fit(self, chunk):
+        """Update the statistics with one chunk. Returns self."""
+        (frame, _) = _frame(chunk)
+        if self.columns is not None:
+            frame = frame[self.columns]
+        if self._n is None:
+            self._n = frame.count() * 0
+            self._init(frame)
+        self._update(frame)
+        self._n = self._n.add(frame.count(), fill_value=0)
+        return self
+
+    def transform(self, chunk):
+        """Scale the fitted columns of one chunk; other columns are passed through unchanged."""
+        assert self._n is not None, f"{type(self).__name__} must be fitted before it can transform."
+        (frame, as_series) = _frame(chunk)
+        frame = frame.copy()
+        columns = [column for column in frame.columns if column in self._n.index]
+        frame[columns] = self._scale(frame[columns].astype(float), columns)
+        return frame.iloc[:, 0].rename(getattr(chunk, "name", None)) if as_series else frame
+
+    def transform_stream(self, chunks):
+        """Generator which scales one chunk at a time."""
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def write(self, chunks, out, sep="\t", index=False, **kwargs):
+        """Scale chunks and write them to the file handle out as they are produced. The header is written once."""
+        for (i, chunk) in enumerate(self.transform_stream(chunks)):
+            chunk.to_csv(out, sep=sep, index=index, header=(i == 0), **kwargs)
+
+    @property
+    def n(self):
+        """Number of non-NaN values seen per column."""
+        return self._n
+
+    def _init(self, frame):
+        raise NotImplementedError
+
+    def _update(self, frame):
+        raise NotImplementedError
+
+    def _scale(self, frame, columns):
+        raise NotImplementedError
+
+
+
+class AbsoluteMaximumScaler(_StreamScaler):
+    """Streaming version of scaler_absolute_maximum: rescales each column to a value between -1 and 1."""
+    def _init(self, frame):
+        self.absmax = frame.count() * float("nan")
+
+    def _update(self, frame):
+        self.absmax = _fmax(self.absmax, frame.abs().max())
+
+    def _scale(self, frame, columns):
+        return frame / self.absmax[columns]
+
+
+
+class MinMaxScaler(_StreamScaler):
+    """Streaming version of scaler_min_max: rescales each column to a range of 0 - 1."""
+    def _init(self, frame):
+        self.min = frame.count() * float("nan")
+        self.max = frame.count() * float("nan")
+
+    def _update(self, frame):
+        self.min = _fmin(self.min, frame.min())
+        self.max = _fmax(self.max, frame.max())
+
+    def _scale(self, frame, columns):
+        return (frame - self.min[columns]) / (self.max[columns] - self.min[columns])
+
+
+
+class ZScoreScaler(_StreamScaler):
+    """Streaming version of scaler_z_scores: transforms each column into z-scores (mean 0, standard deviation 1).
+
+    Mean and variance are accumulated with Welford's algorithm, merging chunks with the update of Chan et al.,
+    so the result matches pandas' mean() and std() (ddof=1) without holding the data.
+    """
+    def _init(self, frame):
+        self.mean = frame.count() * 0.0
+        self._m2  = frame.count() * 0.0
+
+    def _update(self, frame):
+        (n_a, n_b) = (self._n.reindex(frame.columns, fill_value=0), frame.count())
+        mean_b = frame.mean().fillna(0)
+        m2_b = ((frame - mean_b) ** 2).sum()
+        n = n_a + n_b
+        delta = mean_b - self.mean.reindex(frame.columns, fill_value=0)
+        self.mean = self.mean.add((delta * n_b / n).fillna(0), fill_value=0)
+        self._m2 = self._m2.add(m2_b + (delta ** 2 * n_a * n_b / n).fillna(0), fill_value=0)
+
+    @property
+    def std(self):
+        """Sample standard deviation per column (ddof=1, like pandas)."""
+        return (self._m2 / (self._n - 1)) ** 0.5
+
+    def _scale(self, frame, columns):
+        return (frame - self.mean[columns]) / self.std[columns]
+
+
+
+#
+# -%  Helper functions  %-
+
+def iter_chunks(rows, columns=None, numeric=None, chunksize=100_000):
+    """Turn rows from pkcsv.DictReader (dicts or compact Rows) or pkcsv.reader (lists, header first) into DataFrame chunks.
+    Only the named columns are kept if columns is given. The numeric columns (default: all kept columns) are
+    converted to numbers; values which can't be read as numbers become NaN."""
+    import pandas as pd
+    rows = iter(rows)
+    header = None
+    while (batch := list(itertools.islice(rows, chunksize))):
+        if isinstance(batch[0], Mapping):
+            batch = batch if isinstance(batch[0], dict) else [dict(row) for row in batch] # eg. pkcsv.Row from compact=True
+        elif header is None:
+            (header, batch) = (batch[0], batch[1:])
+            if not batch:
+                continue
+        chunk = pd.DataFrame.from_records(batch, columns=header)
+        if columns is not None:
+            chunk = chunk[columns]
+        numeric = chunk.columns if numeric is None else numeric
+        chunk[numeric] = chunk[numeric].apply(pd.to_numeric, errors="coerce")
+        yield chunk
+
+def _frame(chunk):
+    """Return (DataFrame, whether chunk was a Series)."""
+    import pandas as pd
+    if isinstance(chunk, pd.Series):
+        return (chunk.to_frame(name=0), True)
+    if isinstance(chunk, pd.DataFrame):
+        return (chunk, False)
+    return (pd.DataFrame(chunk), False)
+
+def _fmax(a, b):
+    """Element-wise max of two Series, ignoring NaN."""
+    import numpy as np
+    return a.combine(b, np.fmax, fill_value=float("nan"))
+
+def _fmin(a, b):
+    """Element-wise min of two Series, ignoring NaN."""
+    import numpy as np
+    return a.combine(b, np.fmin, fill_value=float("nan"))
+
@@ -2,4 +2,9 @@
 # Import the functions from pksnp that we want
 from .locus import Locus
 from .interval import Interval, IntervalList
+from .intervalindex import IntervalIndex
+from .locusarray import LocusArray, IntervalArray
+from .locusindex import LocusIndex
+from .sweep import sweep_join
+from .score import polygenic_score
 
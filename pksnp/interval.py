@@ -1,8 +1,8 @@
 
-__version__ = "1.0"
+__version__ = "1.1"
+# 1.1 : IntervalList is a real list with sort, merge, coalesce and deduplicate
 
 
-import itertools
 import logging
 
 from .locus import Locus
@@ -72,34 +72,122 @@ class Interval(Locus):
 # --%%  : 'IntervalList' Class Definition  %%--
 
 class IntervalList():
-    """An iterable which functions like a list of intervals."""
-    def __init__(self, iterable):
-        """Takes an iterable which should return something that can be processed with """
-        self._intervals = iter([])
-        for locus in iterable:
-            self.append(locus)
+    """A list of intervals with genome operations like sort, merge and coalesce.
+
+    The bulk operations work on numpy arrays of chromosome codes, starts and ends, so no Interval objects are compared in Python.
+    Intervals are treated as closed, [start, end]; a missing end means a single position.
+    """
+    def __init__(self, iterable=()):
+        """Takes an iterable which should return something that can be processed with append."""
+        self._intervals = []
+        self.extend(iterable)
 
     def __iter__(self):
-        """"""
-        return self
+        return iter(self._intervals)
+
+    def __len__(self):
+        return len(self._intervals)
 
-    def __next__(self):
-        """"""
-        return next(self._intervals)
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return IntervalList(self._intervals[key])
+        return self._intervals[key]
 
     def append(self, interval):
         """Try to convert interval into Interval and append it to the stack."""
         if not isinstance(interval, Interval):
             if isinstance(interval, str):
                 interval = Interval.fromStr(interval)
-            elif isinstance(interval, dict) or isinstance(interval, list):
+            elif isinstance(interval, (dict, list, tuple)):
                 interval = Interval(*interval)
             else:
                 assert False, "Failed to convert."
-        self._intervals = itertools.chain(self._intervals, [interval])
+        self._intervals.append(interval)
+
+    def extend(self, iterable):
+        """Append every interval from iterable."""
+        for interval in iterable:
+            self.append(interval)
+
+    def index(self):
+        """Return an IntervalIndex over the intervals for fast overlap queries."""
+        from .intervalindex import IntervalIndex
+        return IntervalIndex(self)
+
+    def sort(self):
+        """Sort in place by chromosome (natural order: 1, 2, ..., 22, X, Y, M), start and end."""
+        order = self._order()
+        self._intervals = [self._intervals[i] for i in order]
+
+    def merge(self):
+        """Return a new, sorted IntervalList where overlapping intervals are merged into one."""
+        return self._merge(gap=0)
+
+    def coalesce(self):
+        """Return a new, sorted IntervalList where overlapping and adjacent (end + 1 == start) intervals are merged into one."""
+        return self._merge(gap=1)
+
+    def deduplicate(self):
+        """Return a new IntervalList without intervals repeating an earlier chrom, start and end. Order is kept."""
+        import numpy as np
+        (codes, starts, ends) = self._columns()[1:]
+        order = self._order()
+        same = (codes[order][1:] == codes[order][:-1]) & (starts[order][1:] == starts[order][:-1]) & (ends[order][1:] == ends[order][:-1])
+        keep = np.sort(order[np.concatenate(([True], ~same))]) if len(order) else order
+        return IntervalList(self._intervals[i] for i in keep)
+
+    def _order(self):
+        """The stable sort order by chromosome, start and end."""
+        import numpy as np
+        (codes, starts, ends) = self._columns()[1:]
+        return np.lexsort((ends, starts, codes))
+
+    def _merge(self, gap):
+        """Merge sorted intervals on the same chromosome when start <= max(end of the earlier ones) + gap."""
+        import numpy as np
+        (chroms, codes, starts, ends) = self._columns()
+        if not len(self):
+            return IntervalList()
+        order = np.lexsort((ends, starts, codes))
+        (codes, starts, ends) = (codes[order], starts[order], ends[order])
+        # Offset coordinates per chromosome so one running maximum over the sorted arrays never bridges two chromosomes
+        offset = codes.astype(np.int64) * (int(ends.max()) + gap + 1)
+        reach = np.maximum.accumulate(ends + offset)
+        first = np.flatnonzero(np.concatenate(([True], starts[1:] + offset[1:] > reach[:-1] + gap)))
+        last_end = np.maximum.reduceat(ends + offset, first) - offset[first]
+        builds = [self._intervals[i].build for i in order[first]]
+        return IntervalList(Interval(chroms[c], s, end=e, build=b) for (c, s, e, b) in zip(codes[first].tolist(), starts[first].tolist(), last_end.tolist(), builds))
+
+    def _columns(self):
+        """Return (chroms, codes, starts, ends), with codes indexing chroms in natural chromosome order."""
+        import numpy as np
+        chroms = sorted({interval.chrom for interval in self._intervals}, key=_chrom_key)
+        code = {chrom: i for (i, chrom) in enumerate(chroms)}
+        n = len(self._intervals)
+        codes  = np.fromiter((code[interval.chrom] for interval in self._intervals), dtype=np.int64, count=n)
+        starts = np.fromiter((interval.pos or 0 for interval in self._intervals), dtype=np.int64, count=n)
+        ends   = np.fromiter((interval.end or interval.pos or 0 for interval in self._intervals), dtype=np.int64, count=n)
+        return (chroms, codes, starts, np.maximum(starts, ends))
 
 # --%%  : 'IntervalList' Class Definition  %%--
 #
 ##################################################
 
 
+
+#
+# -%  Helper functions  %-
+
+def _chrom_key(chrom):
+    """Sort key giving natural chromosome order; numbered chromosomes first, then X, Y, M and anything else by name."""
+    if chrom is None:
+        return (3, 0, "")
+    name = chrom[3:] if chrom.lower().startswith("chr") else chrom
+    if name.isdigit():
+        return (0, int(name), "")
+    special = {"X": 1, "Y": 2, "M": 3, "MT": 3}
+    if name.upper() in special:
+        return (1, special[name.upper()], "")
+    return (2, 0, name)
+
+
@@ -0,0 +1,171 @@
+
+__version__ = "1.0"
+
+
+import logging
+
+from .locus import Locus
+
+logger = logging.getLogger(__name__)
+
+
+##################################################
+#
+# --%%  : 'IntervalIndex' Class Definition  %%--
+
+class IntervalIndex():
+    """A per-chromosome index of intervals answering overlap queries in O(log n + k).
+
+    Each chromosome holds its intervals sorted by start together with an implicit augmented
+    interval tree (the layout used by cgranges): the sorted array itself is the tree, and every
+    internal node also stores the largest end found in its subtree.
+    Intervals are treated as closed, [start, end], like Interval; a missing end means a single position.
+    """
+    def __init__(self, iterable, zero_based=True):
+        """Takes an iterable of Interval (or Locus) objects, BED3iter rows like (chrom, start, end), or 'CHROM start end' strings.
+        zero_based: Whether the starts of rows and strings are 0-based, half-open like in BED files. Loci are always 1-based."""
+        self._items = []
+        coords = {}
+        for item in iterable:
+            (chrom, start, end) = self._coordinates(item, zero_based)
+            coords.setdefault(chrom, []).append((start, end, len(self._items)))
+            self._items.append(item)
+        self._chroms = {chrom: _Tree(rows) for chrom, rows in coords.items()}
+        logger.debug(f"IntervalIndex: Indexed {len(self._items)} intervals on {len(self._chroms)} chromosomes.")
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    @property
+    def chroms(self):
+        """The chromosomes which hold at least one interval."""
+        return list(self._chroms)
+
+    def overlap_idx(self, chrom, start, end=None):
+        """Return the indices (in input order) of all intervals overlapping chrom:start-end, sorted by interval start."""
+        tree = self._chroms.get(str(chrom))
+        if tree is None:
+            return []
+        start = int(start)
+        return tree.query(start, start if end is None else int(end))
+
+    def overlap(self, chrom, start, end=None):
+        """Return all intervals overlapping chrom:start-end. A missing end makes it a point query."""
+        return [self._items[i] for i in self.overlap_idx(chrom, start, end)]
+
+    def overlap_locus(self, locus):
+        """Return all intervals overlapping a Locus or Interval."""
+        return self.overlap(locus.chrom, locus.pos, getattr(locus, "end", None))
+
+    def count(self, chrom, start, end=None):
+        """Return the number of intervals overlapping chrom:start-end."""
+        return len(self.overlap_idx(chrom, start, end))
+
+    def overlap_many(self, chroms, starts, ends=None):
+        """Bulk query for a batch of positions (or ranges when ends is given).
+
+        Returns two lists of equal length, (query_idx, interval_idx), with one pair per overlap found.
+        Queries are answered in chromosome and position order, so neighbouring queries hit the same part of the tree.
+        """
+        if ends is None:
+            ends = starts
+        queries = sorted(range(len(starts)), key=lambda i: (str(chroms[i]), int(starts[i])))
+        (query_idx, interval_idx) = ([], [])
+        for i in queries:
+            hits = self.overlap_idx(chroms[i], starts[i], ends[i])
+            query_idx.extend([i] * len(hits))
+            interval_idx.extend(hits)
+        return (query_idx, interval_idx)
+
+    @staticmethod
+    def _coordinates(item, zero_based=True):
+        """Extract (chrom, start, end), 1-based and closed, from whatever the iterable returned."""
+        if isinstance(item, Locus):
+            (chrom, start, end) = (item.chrom, item.pos, getattr(item, "end", None))
+            zero_based = False
+        else:
+            if isinstance(item, str):
+                item = item.split()
+            (chrom, start, *rest) = item
+            end = rest[0] if rest else None
+        assert chrom is not None and start is not None, "IntervalIndex needs a chromosome and a start position for every interval."
+        start = int(start) + 1 if zero_based else int(start)
+        end = int(end) if end not in (None, "") else start
+        return (str(chrom), start, max(start, end))
+
+# --%%  : 'IntervalIndex' Class Definition  %%--
+#
+##################################################
+
+
+
+##################################################
+#
+# --%%  : '_Tree' Class Definition  %%--
+
+class _Tree():
+    """Implicit augmented interval tree over one chromosome. See cgranges (Li H, 2019) for the layout."""
+    def __init__(self, rows):
+        """rows: list of (start, end, item_idx) tuples."""
+        rows.sort()
+        self.starts = [row[0] for row in rows]
+        self.ends   = [row[1] for row in rows]
+        self.idx    = [row[2] for row in rows]
+        self.max    = list(self.ends)
+        self.root_k = self._index()
+
+    def _index(self):
+        """Fill in the max end of every subtree and return the level of the root."""
+        (n, ends, maxs) = (len(self.starts), self.ends, self.max)
+        if n == 0:
+            return -1
+        last_i = (n - 1) & ~1
+        last = maxs[last_i]
+        k = 1
+        while (1 << k) <= n:
+            x = 1 << (k - 1)
+            for i in range((x << 1) - 1, n, x << 2):
+                er = maxs[i + x] if i + x < n else last
+                maxs[i] = max(ends[i], maxs[i - x], er)
+            last_i = last_i - x if (last_i >> k) & 1 else last_i + x
+            if last_i < n and maxs[last_i] > last:
+                last = maxs[last_i]
+            k += 1
+        return k - 1
+
+    def query(self, start, end):
+        """Return item indices for all intervals with tree start <= end and tree end >= start."""
+        (n, starts, ends, maxs) = (len(self.starts), self.starts, self.ends, self.max)
+        out = []
+        if n == 0:
+            return out
+        stack = [(self.root_k, (1 << self.root_k) - 1, False)]
+        while stack:
+            (k, x, left_done) = stack.pop()
+            if k <= 3:
+                # Small subtree; a linear scan is faster than descending further
+                i0 = x >> k << k
+                i1 = min(i0 + (1 << (k + 1)) - 1, n)
+                i = i0
+                while i < i1 and starts[i] <= end:
+                    if start <= ends[i]:
+                        out.append(i)
+                    i += 1
+            elif not left_done:
+                y = x - (1 << (k - 1))
+                stack.append((k, x, True))
+                if y >= n or maxs[y] >= start:
+                    stack.append((k - 1, y, False))
+            elif x < n and starts[x] <= end:
+                if start <= ends[x]:
+                    out.append(x)
+                stack.append((k - 1, x + (1 << (k - 1)), False))
+        return [self.idx[i] for i in out]
+
+# --%%  : '_Tree' Class Definition  %%--
+#
+##################################################
+
@@ -0,0 +1,228 @@
+
+__version__ = "1.0"
+
+
+import logging
+
+from .locus import Locus
+from .interval import Interval
+
+logger = logging.getLogger(__name__)
+
+
+##################################################
+#
+# --%%  : 'LocusArray' Class Definition  %%--
+
+class LocusArray():
+    """A compact, column-based container for many genomic positions.
+
+    Chromosomes and builds are stored as categorical codes, positions as an int64 array and IDs as an
+    object array. Missing values are code -1, position 0 and ID None; like Locus, a missing ID is read as the posid.
+    Indexing with an integer returns a Locus view; slices, masks and index arrays return a new LocusArray.
+    """
+    def __init__(self, chrom=None, pos=None, ID=None, build=None):
+        """All arguments are columns (sequences of equal length); build may also be a single value for all loci."""
+        import numpy as np
+        n = self._length(chrom, pos, ID)
+        (self._chroms, self._chrom) = _categorize(chrom, n)
+        (self._builds, self._build) = _categorize(build, n)
+        self._pos = _integers(pos, n)
+        self._ID  = np.full(n, None, dtype=object) if ID is None else np.asarray(ID, dtype=object)
+        assert len(self._chrom) == len(self._pos) == len(self._ID) == n, "All columns in a LocusArray must have the same length."
+
+    @classmethod
+    def fromIDs(cls, IDs, build=None):
+        """Alternative constructor for a list of IDs. IDs like 'chr:pos' (eg '7:1234' or 'X:1234:A:G') are split into chrom and pos."""
+        import numpy as np
+        IDs = np.asarray(IDs, dtype=str)
+        (chrom, sep, rest) = np.char.partition(IDs, ":").T if len(IDs) else (IDs, IDs, IDs)
+        pos = np.char.partition(rest, ":")[:, 0] if len(IDs) else rest
+        parsed = (sep == ":") & (np.char.str_len(chrom) > 0) & (np.char.str_len(np.char.strip(chrom, "0123456789xXyYmM")) == 0) & np.char.isdigit(pos)
+        chrom = np.where(parsed, chrom, None).astype(object)
+        pos   = np.where(parsed, pos, "0")
+        return cls(chrom, pos, ID=IDs.astype(object), build=build)
+
+    @classmethod
+    def fromRows(cls, rows, chrom=0, pos=1, ID=None, build=None):
+        """Alternative constructor for rows from eg. BED3iter, pkcsv.reader or pkcsv.DictReader.
+        chrom, pos and ID are the keys (column index or name) of the columns to use; build is a value."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        column = lambda key: None if key is None else [row[key] for row in rows]
+        return cls(column(chrom), column(pos), ID=column(ID), build=build)
+
+    def __len__(self):
+        return len(self._pos)
+
+    def __iter__(self):
+        """Iterate over Locus views, created lazily one at a time."""
+        for i in range(len(self)):
+            yield self._element(i)
+
+    def __getitem__(self, key):
+        """An integer returns a Locus; anything numpy can index with returns a LocusArray."""
+        import numbers
+        if isinstance(key, numbers.Integral):
+            return self._element(key)
+        return self._take(key)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(n={len(self)}, chroms={list(self._chroms[:-1])})"
+
+    @property
+    def chrom(self):
+        """Chromosome of every locus as an object array (None if missing)."""
+        return self._chroms[self._chrom]
+
+    @property
+    def chrom_codes(self):
+        """Categorical chromosome codes (-1 if missing); see 'chroms' for the categories."""
+        return self._chrom
+
+    @property
+    def chroms(self):
+        """The chromosome categories."""
+        return list(self._chroms[:-1])
+
+    @property
+    def pos(self):
+        """Position of every locus as an int64 array (0 if missing)."""
+        return self._pos
+
+    @property
+    def start(self):
+        """Return pos using start alias."""
+        return self._pos
+
+    @property
+    def build(self):
+        """Genome build of every locus as an object array (None if missing)."""
+        return self._builds[self._build]
+
+    @property
+    def ID(self):
+        """ID of every locus; missing IDs are filled in with the posid like Locus does."""
+        import numpy as np
+        missing = np.equal(self._ID, None)
+        if not missing.any():
+            return self._ID
+        return np.where(missing, self.posid, self._ID)
+
+    @property
+    def posid(self):
+        """Return the position ids as an object array (None where chrom or pos is missing)."""
+        import numpy as np
+        known = (self._chrom >= 0) & (self._pos > 0)
+        posid = np.char.add(np.char.add(self.chrom.astype(str), ":"), self._pos.astype(str))
+        return np.where(known, posid, None).astype(object)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the numeric columns (the ID strings themselves are not included)."""
+        return self._chrom.nbytes + self._build.nbytes + self._pos.nbytes + self._ID.nbytes
+
+    def _element(self, i):
+        """Return a Locus for element i."""
+        return Locus(self._chroms[self._chrom[i]], self._pos[i] or None, ID=self._ID[i], build=self._builds[self._build[i]])
+
+    def _take(self, key):
+        """Return a new array of the same type holding the selected elements."""
+        out = object.__new__(type(self))
+        for (name, value) in vars(self).items():
+            setattr(out, name, value[key] if name in self._columns else value)
+        return out
+
+    _columns = ("_chrom", "_build", "_pos", "_ID")
+
+    @staticmethod
+    def _length(*columns):
+        """Length of the first column which is not None (0 if all are)."""
+        for column in columns:
+            if column is not None:
+                return len(column)
+        return 0
+
+# --%%  : 'LocusArray' Class Definition  %%--
+#
+##################################################
+
+
+
+##################################################
+#
+# --%%  : 'IntervalArray' Class Definition  %%--
+
+class IntervalArray(LocusArray):
+    """A compact, column-based container for many genomic intervals. Like LocusArray, but with an end column (0 if missing)."""
+    def __init__(self, chrom=None, pos=None, end=None, ID=None, build=None, start=None):
+        """Start position is mandatory, but end is optional."""
+        assert pos is None or start is None, "Please do not specify both 'pos' and 'start'"
+        pos = start if pos is None else pos
+        super().__init__(chrom, pos, ID=ID, build=build)
+        self._end = _integers(end, len(self))
+
+    @classmethod
+    def fromRows(cls, rows, chrom=0, pos=1, end=2, ID=None, build=None):
+        """Alternative constructor for rows from eg. BED3iter, pkcsv.reader or pkcsv.DictReader. Defaults to BED columns."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        column = lambda key: None if key is None else [row[key] for row in rows]
+        return cls(column(chrom), column(pos), end=column(end), ID=column(ID), build=build)
+
+    @property
+    def end(self):
+        """End of every interval as an int64 array (0 if missing)."""
+        return self._end
+
+    @property
+    def posid(self):
+        """Return the position ids; 'chrom:start:end' where end is known, 'chrom:start' otherwise."""
+        import numpy as np
+        posid = super().posid
+        with_end = np.not_equal(posid, None) & (self._end > 0)
+        posid[with_end] = np.char.add(np.char.add(posid[with_end].astype(str), ":"), self._end[with_end].astype(str))
+        return posid
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self._end.nbytes
+
+    def _element(self, i):
+        """Return an Interval for element i."""
+        return Interval(self._chroms[self._chrom[i]], self._pos[i] or None, end=self._end[i] or None, ID=self._ID[i], build=self._builds[self._build[i]])
+
+    _columns = LocusArray._columns + ("_end",)
+
+# --%%  : 'IntervalArray' Class Definition  %%--
+#
+##################################################
+
+
+
+#
+# -%  Helper functions  %-
+
+def _categorize(values, n):
+    """Return (categories, codes) for a column or a single value. The categories carry a trailing None so that categories[codes] decodes missing (-1) codes too."""
+    import numpy as np
+    if values is None or isinstance(values, str):
+        categories = [] if values is None else [values]
+        return (np.array(categories + [None], dtype=object), np.full(n, len(categories) - 1, dtype=np.int32))
+    values = np.full(n, values, dtype=object) if np.ndim(values) == 0 else np.asarray(values, dtype=object)
+    missing = np.equal(values, None) | np.equal(values, "")
+    (categories, codes) = np.unique(values[~missing].astype(str), return_inverse=True)
+    out = np.full(len(values), -1, dtype=np.int32)
+    out[~missing] = codes
+    return (np.array([str(c) for c in categories] + [None], dtype=object), out)
+
+def _integers(values, n):
+    """Convert a column of ints or numeric strings to int64 in bulk; None and '' become 0."""
+    import numpy as np
+    if values is None:
+        return np.zeros(n, dtype=np.int64)
+    values = np.asarray(values)
+    if values.dtype.kind == "O":
+        values = np.where(np.equal(values, None), "", values).astype(str)
+    if values.dtype.kind in "US":
+        values = np.where(values == "", "0", values)
+    return values.astype(np.int64)
+
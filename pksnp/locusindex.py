@@ -0,0 +1,81 @@
+
+__version__ = "1.0"
+
+
+import logging
+
+from .locusarray import LocusArray
+
+logger = logging.getLogger(__name__)
+
+
+##################################################
+#
+# --%%  : 'LocusIndex' Class Definition  %%--
+
+class LocusIndex():
+    """A hash index of loci by ID and by (chrom, pos) at the same time.
+
+    Lookups follow the matching rule of Locus.__eq__: two loci match if their IDs are equal, or if both
+    have a chromosome and a position and these are equal. Each match is reported once, even if both keys agree.
+    """
+    def __init__(self, loci):
+        """Takes an iterable of Locus/Interval objects or a LocusArray."""
+        self._byID  = {}
+        self._byPos = {}
+        self._n = 0
+        for (i, (ID, chrom, pos)) in enumerate(_keys(loci)):
+            self._byID.setdefault(ID, []).append(i)
+            if chrom is not None and pos:
+                self._byPos.setdefault((chrom, pos), []).append(i)
+            self._n = i + 1
+        logger.debug(f"LocusIndex: Indexed {self._n} loci; {len(self._byID)} IDs and {len(self._byPos)} positions.")
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, locus):
+        return bool(self.lookup(locus))
+
+    def lookup(self, locus):
+        """Return the sorted indices of all indexed loci matching locus."""
+        return self._match(locus.ID, locus.chrom, locus.pos)
+
+    def join(self, other):
+        """Match every locus in other (an iterable of Locus objects or a LocusArray) against the index.
+
+        Returns two lists of equal length, (self_idx, other_idx), with one pair per matching pair of loci.
+        """
+        (self_idx, other_idx) = ([], [])
+        for (j, (ID, chrom, pos)) in enumerate(_keys(other)):
+            hits = self._match(ID, chrom, pos)
+            self_idx.extend(hits)
+            other_idx.extend([j] * len(hits))
+        logger.debug(f"LocusIndex: Join found {len(self_idx)} matching pairs.")
+        return (self_idx, other_idx)
+
+    def _match(self, ID, chrom, pos):
+        """Union of the ID and the (chrom, pos) matches."""
+        byID  = self._byID.get(ID, [])
+        byPos = self._byPos.get((chrom, pos), []) if chrom is not None and pos else []
+        if not byPos:
+            return byID
+        if not byID:
+            return byPos
+        return sorted(set(byID).union(byPos))
+
+# --%%  : 'LocusIndex' Class Definition  %%--
+#
+##################################################
+
+
+
+#
+# -%  Helper functions  %-
+
+def _keys(loci):
+    """Iterate over (ID, chrom, pos) for every locus; LocusArrays are read column-wise."""
+    if isinstance(loci, LocusArray):
+        return zip(loci.ID.tolist(), loci.chrom.tolist(), loci.pos.tolist())
+    return ((locus.ID, locus.chrom, locus.pos) for locus in loci)
+
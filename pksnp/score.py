@@ -0,0 +1,315 @@
+__version__ = "1.0"
+
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+COMPLEMENT = str.maketrans("ACGTacgt", "TGCAtgca")
+
+
+#
+# -%  Polygenic scores from PGS weights and VCF genotypes  %-
+
+def polygenic_score(vcf, scores, samples=None, field="DS", n_jobs=None, chunk_size=1000, flip=True, keep_ambiguous=False, impute="mean"):
+    """Sum weights times effect allele dosages for every sample, for one or more scores in a single pass over the VCF.
+
+    Score variants are matched to VCF records on chromosome ('chr' prefixes are ignored), position and alleles. The effect
+    allele may be REF or any ALT; if the score has an other allele it must be in the record too. Dosages of matched records
+    are collected chunk_size records at a time and added to the scores with one matrix product per chunk.
+    With a tabix or CSI index, the genome is split into regions of about equal size (pkclick.vcfregions.split), which are
+    scored by a pool of processes; otherwise the file is read once, start to end.
+    Args:
+        vcf:            Path of a VCF/BCF file, or a pysam.VariantFile from pkclick.VCFFile.
+        scores:         A PGSScore (pkclick.PGSFile(parsed=True)), a path to a scoring file, or a list of these.
+                        Anything with chrom, pos, effect_allele, other_allele, weights and accessions columns will do.
+        samples:        Score only these samples (default: all, in VCF order).
+        field:          'DS' uses dosages where the record has them and falls back to GT; 'GT' always counts genotypes.
+        n_jobs:         Number of processes (default: all CPUs). 1 scores in this process.
+        flip:           Also match SNPs on the opposite strand (effect and other allele complemented).
+        keep_ambiguous: Keep A/T and C/G SNPs, whose strand can't be told from the alleles. They are dropped by default.
+        impute:         'mean' replaces missing dosages with the mean dosage of the variant over all samples in the VCF (like
+                        plink), so a sample's score doesn't depend on which other samples are scored; None counts them as 0.
+    Returns:
+        pandas.DataFrame with a row per sample and a column per accession. attrs["variants"] and attrs["matched"] hold the
+        number of variants with a weight, and of those found in the VCF, per accession.
+    Raises:
+        ValueError if any of samples are not in the VCF.
+    """
+    import os
+    import numpy as np
+    import pandas as pd
+    import pysam
+    from pklib.pkclick.vcfregions import split
+    path = os.fsdecode(vcf if isinstance(vcf, (str, os.PathLike)) else vcf.filename)
+    scores = [_load(s) for s in (scores if isinstance(scores, (list, tuple)) else [scores])]
+    accessions = [accession for s in scores for accession in s.accessions]
+    bounds = np.cumsum([0] + [len(s.accessions) for s in scores])
+    with pysam.VariantFile(path) as handle:
+        names = list(handle.header.samples)
+        indexed = handle.index is not None
+    columns = None if samples is None else _columns(names, samples)
+    samples = names if samples is None else list(samples)
+
+    n_jobs = n_jobs or os.cpu_count()
+    tasks = _tasks(scores, split(path, 4 * n_jobs) if indexed else None)
+    options = {"path": path, "columns": columns, "n_samples": len(samples), "n_out": len(accessions), "bounds": bounds,
+               "field": field, "chunk_size": chunk_size, "flip": flip, "keep_ambiguous": keep_ambiguous, "impute": impute}
+    n_jobs = min(n_jobs, max(len(tasks), 1))
+    logger.info(f"polygenic_score: Scoring {len(accessions)} accession(s) on {len(samples)} samples in {len(tasks)} part(s) using {n_jobs} process(es).")
+    if n_jobs == 1:
+        results = [_score_task(region, task, options) for (region, task) in tasks.items()]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            jobs = [pool.submit(_score_task, region, task, options) for (region, task) in tasks.items()]
+            results = [job.result() for job in jobs] # Reduced in region order, so the sums don't depend on timing
+
+    total = np.zeros((len(samples), len(accessions)))
+    matched = [np.zeros(len(s.pos), dtype=bool) for s in scores]
+    for (task, (partial, hits)) in zip(tasks.values(), results):
+        total += partial
+        for (i, s) in enumerate(scores):
+            matched[i][task["row"][hits[task["score"][hits] == i]]] = True
+    out = pd.DataFrame(total, index=pd.Index(samples, name="sample"), columns=accessions)
+    out.attrs["variants"] = {}
+    out.attrs["matched"] = {}
+    for (i, s) in enumerate(scores):
+        weighted = np.nan_to_num(np.asarray(s.weights, dtype=np.float64)) != 0
+        for (j, accession) in enumerate(s.accessions):
+            (n, m) = (int(weighted[:, j].sum()), int((weighted[:, j] & matched[i]).sum()))
+            (out.attrs["variants"][accession], out.attrs["matched"][accession]) = (n, m)
+            logger.info(f"polygenic_score: {accession}: Matched {m} of {n} variants ({m / n if n else 0:.1%}).")
+    return out
+
+def match_allele(ref, alts, effect, other=None, flip=True, keep_ambiguous=False):
+    """Return the index of the effect allele in the record's alleles (0 is REF, 1 the first ALT, ...), or None if the
+    score variant doesn't match the record. See polygenic_score for flip and keep_ambiguous."""
+    alleles = [ref.upper()] + [alt.upper() for alt in alts]
+    (effect, other) = (effect.upper(), None if other is None else other.upper())
+    tries = [(effect, other)]
+    if flip and len(effect) == 1 and (other is None or len(other) == 1):
+        tries.append((effect.translate(COMPLEMENT), None if other is None else other.translate(COMPLEMENT)))
+    for (e, o) in tries:
+        if e in alleles and (o is None or (o in alleles and o != e)):
+            j = alleles.index(e)
+            partner = o if o is not None else (alleles[1] if j == 0 and len(alleles) == 2 else alleles[0] if j else None)
+            if not keep_ambiguous and len(e) == 1 and partner == e.translate(COMPLEMENT):
+                return None
+            return j
+    return None
+
+def dosages(line, allele, field="DS", columns=None):
+    """Dosages of allele (0 is REF) for every sample in a VCF line, as a float64 array with NaN where missing.
+    field: 'DS' reads DS if the record has it, else GT. columns: Only these samples (indexes). Returns None if the record
+    has neither DS nor GT."""
+    from operator import itemgetter
+    fields = line.rstrip("\n").split("\t", 9)
+    fmt = fields[8].split(":")
+    key = "DS" if field == "DS" and "DS" in fmt else "GT" if "GT" in fmt else None
+    if key is None or len(fields) < 10:
+        return None
+    (k, width) = (fmt.index(key), len(fmt))
+    parts = fields[9].replace("\t", ":").split(":")
+    if len(parts) == (fields[9].count("\t") + 1) * width:
+        values = parts[k::width]
+    else: # Trailing fields may be left out of a sample, eg. './.' for 'GT:DS'
+        values = [(sample.split(":") + [""] * width)[k] for sample in fields[9].split("\t")]
+    if columns is not None:
+        values = list(itemgetter(*columns)(values)) if len(columns) != 1 else [values[columns[0]]]
+    n_alts = fields[4].count(",") + 1
+    return _ds(values, allele, n_alts) if key == "DS" else _gt(values, allele)
+
+
+
+#
+# -%  Helper functions  %-
+
+def _load(score):
+    import os
+    if isinstance(score, (str, os.PathLike)):
+        from pklib.pkclick.pgscache import load
+        return load(score)
+    return score
+
+def _contig(chrom):
+    """Chromosome name without any 'chr' prefix; 'M' becomes 'MT'."""
+    if chrom is None:
+        return None
+    chrom = str(chrom)
+    chrom = chrom[3:] if chrom[:3].lower() == "chr" else chrom
+    return "MT" if chrom == "M" else chrom
+
+def _tasks(scores, regions):
+    """Split the score variants by region. Returns {(contig, start, end): task}, or {None: task} for all of them if regions is None.
+    A task holds the chromosome, position, alleles, score number and row of its variants, and their weights per score."""
+    import numpy as np
+    parts = {}
+    for (i, s) in enumerate(scores):
+        chrom = np.array([_contig(c) for c in s.chrom], dtype=object)
+        pos = np.asarray(s.pos, dtype=np.int64)
+        (effect, other) = (np.asarray(s.effect_allele, dtype=object), np.asarray(s.other_allele, dtype=object))
+        weights = np.nan_to_num(np.asarray(s.weights, dtype=np.float64))
+        valid = (pos > 0) & np.not_equal(chrom, None) & np.not_equal(effect, None) & (weights != 0).any(axis=1)
+        for c in sorted(set(chrom[valid])):
+            rows = np.flatnonzero(valid & (chrom == c))
+            parts.setdefault(c, []).append((i, rows, chrom[rows], pos[rows], effect[rows], other[rows], weights[rows]))
+    if regions is None:
+        groups = {None: [part for c in parts for part in parts[c]]}
+    else:
+        groups = {region: _within(parts[_contig(region[0])], region) for region in regions if _contig(region[0]) in parts}
+        groups = {region: group for (region, group) in groups.items() if group}
+        missing = set(parts) - {_contig(region[0]) for region in regions}
+        if missing:
+            logger.warning(f"polygenic_score: Chromosomes {sorted(missing)} are not in the VCF index; their variants can't be matched.")
+    tasks = {}
+    for (region, group) in groups.items():
+        weights = [[np.zeros((0, len(s.accessions)))] for s in scores]
+        offsets = []
+        for part in group:
+            offsets.append(sum(map(len, weights[part[0]])) + np.arange(len(part[1]))) # Row in the task's weights for its score
+            weights[part[0]].append(part[6])
+        tasks[region] = {
+            "score" : np.concatenate([np.full(len(part[1]), part[0]) for part in group]),
+            "row"   : np.concatenate([part[1] for part in group]),
+            "offset": np.concatenate(offsets),
+            "chrom" : np.concatenate([part[2] for part in group]),
+            "pos"   : np.concatenate([part[3] for part in group]),
+            "effect": np.concatenate([part[4] for part in group]),
+            "other" : np.concatenate([part[5] for part in group]),
+            "weights": [np.vstack(blocks) for blocks in weights],
+        }
+    return tasks
+
+def _columns(names, samples):
+    """Column numbers of samples among the VCF samples names. Raises ValueError naming any samples not in the VCF."""
+    index = {name: i for (i, name) in enumerate(names)}
+    missing = [sample for sample in samples if sample not in index]
+    if missing:
+        raise ValueError(f"polygenic_score: {len(missing)} sample(s) not found in the VCF: {', '.join(map(str, missing[:10]))}{' ...' if len(missing) > 10 else ''}")
+    return [index[sample] for sample in samples]
+
+def _within(group, region):
+    """The parts of group (see _tasks) cut down to the variants starting in region."""
+    (contig, start, end) = region
+    out = []
+    for part in group:
+        pos = part[3] - 1 # 0-based start
+        keep = (pos >= start) & (pos < end if end is not None else True)
+        if keep.any():
+            out.append((part[0],) + tuple(column[keep] for column in part[1:]))
+    return out
+
+def _score_task(region, task, options):
+    """Worker: Score the variants of one task. Returns (partial scores, indexes of the task's variants that were matched)."""
+    import numpy as np
+    lookup = {}
+    for (i, key) in enumerate(zip(task["chrom"].tolist(), task["pos"].tolist())):
+        lookup.setdefault(key, []).append(i)
+    matched = np.zeros(len(task["pos"]), dtype=bool)
+    out = np.zeros((options["n_samples"], options["n_out"]))
+    (chunk, hits) = ([], [])
+    for (chrom, pos, record) in _records(options["path"], region):
+        rows = lookup.get((_contig(chrom), pos))
+        if rows is None:
+            continue
+        (ref, alts, line) = _alleles(record)
+        found = {} # Allele -> row in chunk
+        for i in rows:
+            if matched[i]:
+                continue
+            allele = match_allele(ref, alts, task["effect"][i], task["other"][i], options["flip"], options["keep_ambiguous"])
+            if allele is None:
+                continue
+            if allele not in found:
+                values = dosages(line, allele, options["field"], options["columns"])
+                if values is None:
+                    continue
+                found[allele] = len(chunk)
+                everyone = None if options["columns"] is None else (lambda: dosages(line, allele, options["field"]))
+                chunk.append(_impute(values, options["impute"], everyone))
+            matched[i] = True
+            hits.append((found[allele], i))
+        if len(chunk) >= options["chunk_size"]:
+            _accumulate(out, chunk, hits, task, options["bounds"])
+            (chunk, hits) = ([], [])
+    if chunk:
+        _accumulate(out, chunk, hits, task, options["bounds"])
+    return (out, np.flatnonzero(matched))
+
+def _accumulate(out, chunk, hits, task, bounds):
+    """Add the chunk's dosages times weights to out, one matrix product per score."""
+    import numpy as np
+    dosage = np.vstack(chunk)
+    (where, rows) = (np.array([h[0] for h in hits]), np.array([h[1] for h in hits]))
+    for s in np.unique(task["score"][rows]):
+        mine = task["score"][rows] == s
+        weights = task["weights"][s][task["offset"][rows[mine]]]
+        out[:, bounds[s]:bounds[s + 1]] += dosage[where[mine]].T @ weights
+
+def _records(path, region):
+    """Yield (chrom, pos, record) for the records starting in region (all records if None). A record is the text line where
+    pysam's tabix reader can be used (faster, as the samples aren't parsed), otherwise a pysam VariantRecord."""
+    import os
+    import pysam
+    from pklib.pkclick.vcfregions import records
+    if path.endswith(".gz") and os.path.exists(f"{path}.tbi") and region is not None:
+        with pysam.TabixFile(path) as tbx:
+            for line in tbx.fetch(*region):
+                (chrom, pos, _) = line.split("\t", 2)
+                if int(pos) > region[1]:
+                    yield (chrom, int(pos), line)
+        return
+    with pysam.VariantFile(path) as vcf:
+        for record in (records(vcf, region) if region is not None else vcf):
+            yield (record.chrom, record.pos, record)
+
+def _alleles(record):
+    """Return (ref, alts, text line) of a record from _records."""
+    if isinstance(record, str):
+        fields = record.split("\t", 5)
+        return (fields[3], [] if fields[4] == "." else fields[4].split(","), record)
+    return (record.ref, list(record.alts or ()), str(record))
+
+def _ds(values, allele, n_alts):
+    import numpy as np
+    if n_alts == 1:
+        try:
+            ds = np.array(values, dtype=np.float64)
+        except ValueError: # Missing values ('.' or '')
+            ds = np.array([_float(value) for value in values])
+        return ds if allele else 2 - ds
+    ds = np.array([[_float(x) for x in (value.split(",") + [""] * n_alts)[:n_alts]] for value in values]).reshape(-1, n_alts)
+    return ds[:, allele - 1] if allele else 2 - ds.sum(axis=1)
+
+def _gt(values, allele):
+    """Count allele in each genotype. Diploid single-digit genotypes (eg. '0|1', './.') are counted in bulk."""
+    import numpy as np
+    text = " ".join(values).encode()
+    if allele < 10 and len(text) == 4 * len(values) - 1:
+        raw = np.frombuffer(text, dtype=np.uint8)
+        (a1, sep, a2) = (raw[0::4], raw[1::4], raw[2::4])
+        if np.isin(sep, (ord("/"), ord("|"))).all():
+            gt = (a1 == 48 + allele).astype(np.float64) + (a2 == 48 + allele)
+            gt[(a1 == ord(".")) | (a2 == ord("."))] = np.nan
+            return gt
+    target = str(allele)
+    calls = [value.replace("|", "/").split("/") for value in values]
+    return np.array([np.nan if "." in call or "" in call else sum(a == target for a in call) for call in calls], dtype=np.float64)
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+def _impute(values, impute, everyone=None):
+    """Fill in missing dosages; with impute='mean' with the mean dosage over all samples in the file, otherwise with 0.
+    everyone: Returns the dosages of all samples, if values only holds some of them. Only called if something is missing."""
+    import numpy as np
+    missing = np.isnan(values)
+    if missing.any():
+        pool = values if everyone is None or impute != "mean" else everyone()
+        values[missing] = np.nanmean(pool) if impute == "mean" and not np.isnan(pool).all() else 0.0
+    return values
+
@@ -0,0 +1,119 @@
+
+__version__ = "1.0"
+
+
+import logging
+
+from .locus import Locus
+
+logger = logging.getLogger(__name__)
+
+
+#
+# -%  Streaming sweep-line join of sorted records and intervals  %-
+
+def sweep_join(records, intervals, contigs=None, zero_based=True, all_records=False):
+    """Join two coordinate-sorted streams in one pass, holding only the currently active intervals in memory.
+
+    Yields (record, [overlapping intervals]) for each record with at least one overlap (for every record if all_records is True).
+    Args:
+        records:     Sorted records with chrom and pos (1-based) attributes, eg. the pysam records from pkclick.VCFFile.
+                     The end is taken from 'stop' (pysam) or 'end' (Interval) if present, otherwise pos.
+        intervals:   Sorted intervals; BED3iter rows (chrom, start, end), lists or Interval objects.
+        contigs:     Chromosome order shared by both streams. Taken from records.header.contigs if available, otherwise
+                     the streams must be in the usual order: 1-22 by number, then X, Y and M, then any others by name.
+                     Interval chromosomes not in contigs are skipped.
+        zero_based:  Whether interval starts are 0-based, half-open like in BED files.
+        all_records: Also yield records without overlaps.
+    Raises:
+        ValueError if either stream turns out not to be sorted (in the order of contigs), or a record chromosome isn't in contigs.
+    """
+    if contigs is None:
+        try: contigs = list(records.header.contigs)
+        except AttributeError: pass
+    order = _rank(contigs) if contigs else _natural
+    spans = _sorted_spans(intervals, zero_based, order)
+    pending = next(spans, None)
+    active = []
+    (chrom, key, last) = (None, None, 0)
+    for record in records:
+        (rchrom, rstart, rend) = _record_span(record)
+        if rchrom != chrom:
+            rkey = order(rchrom)
+            if rkey is None:
+                raise ValueError(f"sweep_join: Record chromosome '{rchrom}' is not in contigs.")
+            if key is not None and rkey <= key:
+                raise ValueError(f"sweep_join: Records are not sorted; chromosome '{rchrom}' follows '{chrom}'. {_HINT}")
+            (chrom, key, last, active) = (rchrom, rkey, 0, [])
+        elif rstart < last:
+            raise ValueError(f"sweep_join: Records are not sorted; {chrom}:{rstart} follows {chrom}:{last}.")
+        last = rstart
+        # Skip intervals on chromosomes which the records have passed (or will never reach)
+        while pending is not None and pending[0] != chrom and (pending[4] is None or pending[4] < key):
+            pending = next(spans, None)
+        # Activate intervals starting before the record ends, then expire those ending before it starts
+        while pending is not None and pending[0] == chrom and pending[1] <= rend:
+            active.append(pending)
+            pending = next(spans, None)
+        active = [span for span in active if span[2] >= rstart]
+        hits = [span[3] for span in active if span[1] <= rend]
+        if hits or all_records:
+            yield (record, hits)
+    for _ in spans: # Intervals out of order would have hidden the ones after them; read the rest to check their order
+        pass
+
+
+
+#
+# -%  Helper functions  %-
+
+_HINT = "Give the chromosome order with contigs if it isn't 1-22, X, Y, M."
+
+def _rank(contigs):
+    """Sort key for the chromosomes in contigs: Their position in it, or None for chromosomes not in it."""
+    rank = {str(chrom): i for (i, chrom) in enumerate(contigs)}
+    return rank.get
+
+def _natural(chrom):
+    """Sort key for chromosome names in the usual order: 1-22 by number, then X, Y and M (MT), then the rest by name.
+    A 'chr' prefix is ignored."""
+    name = chrom[3:] if chrom[:3].lower() == "chr" else chrom
+    if name.isdigit():
+        return (0, int(name), chrom)
+    special = {"X": 1, "Y": 2, "M": 3, "MT": 3}.get(name.upper())
+    return (1, special, chrom) if special else (2, 0, chrom)
+
+def _record_span(record):
+    """Return (chrom, start, end) of a record, 1-based and closed."""
+    start = int(record.pos)
+    end = getattr(record, "stop", None) or getattr(record, "end", None) or start
+    return (str(record.chrom), start, max(start, int(end)))
+
+def _sorted_spans(intervals, zero_based, order):
+    """Yield (chrom, start, end, interval, key), 1-based and closed, where key is order(chrom), and check that the intervals are
+    sorted. Chromosomes without a key (not in contigs) may come anywhere."""
+    done = set()
+    (chrom, key, last) = (None, None, 0)
+    for interval in intervals:
+        if isinstance(interval, Locus):
+            (ichrom, start, end) = (interval.chrom, interval.pos, getattr(interval, "end", None))
+        else:
+            (ichrom, start, *rest) = interval
+            end = rest[0] if rest else None
+        (start, ichrom) = (int(start) + 1 if zero_based else int(start), str(ichrom))
+        end = max(start, int(end)) if end not in (None, "") else start
+        if ichrom != chrom:
+            if ichrom in done:
+                raise ValueError(f"sweep_join: Intervals are not sorted; found chromosome '{ichrom}' twice.")
+            if chrom is not None:
+                done.add(chrom)
+            ikey = order(ichrom)
+            if ikey is not None and key is not None and ikey < key:
+                raise ValueError(f"sweep_join: Intervals are not sorted; chromosome '{ichrom}' follows '{chrom}'. {_HINT}")
+            (chrom, key, last) = (ichrom, ikey if ikey is not None else key, 0)
+            span_key = ikey
+        elif start < last:
+            raise ValueError(f"sweep_join: Intervals are not sorted; {chrom}:{start} follows {chrom}:{last}.")
+        last = start
+        yield (ichrom, start, end, interval, span_key)
+